@@ -1,21 +1,42 @@
-import io
 import logging
 import os
 from pathlib import Path
-from urllib.parse import quote
+from tempfile import SpooledTemporaryFile
+from typing import BinaryIO
 
 from fastapi import APIRouter, UploadFile, File, HTTPException, status
-from fastapi.responses import StreamingResponse, FileResponse, HTMLResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, FileResponse, HTMLResponse, JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 
 from app.core.config import settings
-from app.services.converter import EPUBToPDFConverter, ConversionError
+from app.services.converter import DEBUG_HTML_PATH, EPUBToPDFConverter, ConversionError
 
 router = APIRouter(prefix="/api", tags=["converter"])
 logger = logging.getLogger(__name__)
 converter = EPUBToPDFConverter()
 
-# Path to debug HTML file
-DEBUG_HTML_PATH = '/tmp/debug.html'
+# Upload limits resolved once from settings for cheap per-request checks
+ALLOWED_EXTENSIONS = frozenset(settings.allowed_extensions)
+ALLOWED_MIME_TYPES = frozenset(settings.allowed_mime_types)
+ALLOWED_EXTENSIONS_TEXT = ', '.join(settings.allowed_extensions)
+ALLOWED_MIME_TYPES_TEXT = ', '.join(settings.allowed_mime_types)
+MAX_UPLOAD_SIZE_BYTES = settings.max_upload_size_mb * 1024 * 1024
+
+# Uploads are read in chunks and kept in memory up to this size before spilling to disk
+UPLOAD_CHUNK_SIZE = 1 << 20
+UPLOAD_SPOOL_MAX_SIZE = 8 << 20
+
+# Generated PDFs are written to a spool of the same kind and streamed back in chunks
+PDF_SPOOL_MAX_SIZE = 8 << 20
+PDF_CHUNK_SIZE = 1 << 20
+
+# Percent-encoding for each byte value as RFC 5987 / RFC 3986 expect: unreserved
+# characters pass through, everything else becomes %XX
+UNRESERVED_BYTES = frozenset(b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~')
+PERCENT_ENCODE_TABLE = tuple(
+    chr(b) if b in UNRESERVED_BYTES else f'%{b:02X}' for b in range(256)
+)
 
 
 def get_disposition_header(original_filename: str) -> str:
@@ -24,12 +45,24 @@ def get_disposition_header(original_filename: str) -> str:
     pdf_name = original_filename.rsplit('.', 1)[0] + '.pdf' if '.' in original_filename else original_filename + '.pdf'
     
     # RFC 5987 encoding: supports UTF-8 filenames with ASCII fallback
-    encoded_name = quote(pdf_name.encode('utf-8'), safe='')
+    encoded_name = ''.join(map(PERCENT_ENCODE_TABLE.__getitem__, pdf_name.encode('utf-8')))
     ascii_fallback = "output.pdf"
     
     return f'attachment; filename="{ascii_fallback}"; filename*=UTF-8\'\'{encoded_name}'
 
 
+def _read_debug_html(size: int = -1) -> str:
+    """Read the debug HTML file (blocking; call via run_in_threadpool)."""
+    with open(DEBUG_HTML_PATH, 'r', encoding='utf-8') as f:
+        return f.read(size)
+
+
+def _iter_file_chunks(file: BinaryIO):
+    """Yield a file's remaining contents in PDF_CHUNK_SIZE pieces."""
+    while chunk := file.read(PDF_CHUNK_SIZE):
+        yield chunk
+
+
 def _validate_file(file: UploadFile) -> None:
     """
     Validate uploaded file.
@@ -43,49 +76,74 @@ def _validate_file(file: UploadFile) -> None:
     # Check file extension
     filename = file.filename or ""
     file_ext = Path(filename).suffix.lower()
-    if file_ext not in settings.allowed_extensions:
+    if file_ext not in ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid file extension: {file_ext}. Allowed extensions: {', '.join(settings.allowed_extensions)}",
+            detail=f"Invalid file extension: {file_ext}. Allowed extensions: {ALLOWED_EXTENSIONS_TEXT}",
         )
 
     # Check MIME type
     content_type = file.content_type or ""
-    if content_type not in settings.allowed_mime_types:
-        logger.warning(f"File MIME type {content_type} not in allowed list")
+    if content_type not in ALLOWED_MIME_TYPES:
+        logger.warning("File MIME type %s not in allowed list", content_type)
         # We'll still allow it if extension is valid, but log the warning
-        if file_ext not in [".epub"]:
+        if file_ext != ".epub":
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Invalid MIME type: {content_type}. Allowed types: {', '.join(settings.allowed_mime_types)}",
+                detail=f"Invalid MIME type: {content_type}. Allowed types: {ALLOWED_MIME_TYPES_TEXT}",
             )
 
 
-async def _validate_file_size(file: UploadFile) -> None:
+async def _validate_file_size(file: UploadFile) -> BinaryIO:
     """
-    Validate file size.
+    Validate file size and return a readable file for the upload.
+
+    The multipart parser has normally already spooled the upload and recorded
+    its size, in which case that file is returned as-is with no extra I/O.
+    Otherwise the upload is copied into a spool in a single chunked pass.
 
     Args:
         file: The uploaded file
 
+    Returns:
+        Binary file containing the upload, rewound to the start
+
     Raises:
         HTTPException: If file is too large
     """
-    max_size_bytes = settings.max_upload_size_mb * 1024 * 1024
-    file_content = await file.read()
-    await file.seek(0)
+    if file.size is not None:
+        if file.size > MAX_UPLOAD_SIZE_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"File size exceeds maximum allowed size of {settings.max_upload_size_mb}MB",
+            )
+        logger.info("File size: %d bytes", file.size)
+        await file.seek(0)
+        return file.file
 
-    if len(file_content) > max_size_bytes:
-        raise HTTPException(
-            status_code=413,
-            detail=f"File size exceeds maximum allowed size of {settings.max_upload_size_mb}MB",
-        )
+    spool = SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_SIZE)
+    total = 0
 
-    return len(file_content)
+    try:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            total += len(chunk)
+            if total > MAX_UPLOAD_SIZE_BYTES:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"File size exceeds maximum allowed size of {settings.max_upload_size_mb}MB",
+                )
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+
+    logger.info("File size: %d bytes", total)
+    spool.seek(0)
+    return spool
 
 
 @router.post("/convert")
-async def convert_epub_to_pdf(file: UploadFile = File(...)) -> StreamingResponse:
+async def convert_epub_to_pdf(file: UploadFile = File(...)) -> Response:
     """
     Convert an EPUB file to PDF.
 
@@ -93,54 +151,63 @@ async def convert_epub_to_pdf(file: UploadFile = File(...)) -> StreamingResponse
         file: The EPUB file to convert
 
     Returns:
-        PDF file as a streaming response
+        PDF file streamed from a spool, with a known Content-Length
 
     Raises:
         HTTPException: If conversion fails or file is invalid
     """
-    logger.info(f"Received conversion request for file: {file.filename}")
+    logger.info("Received conversion request for file: %s", file.filename)
 
+    epub_file = None
+    pdf_file = None
     try:
         # Validate file type and extension
         _validate_file(file)
 
-        # Validate file size
-        file_size = await _validate_file_size(file)
-        logger.info(f"File size: {file_size} bytes")
-
-        # Read file content
-        epub_content = await file.read()
-        logger.info(f"Read {len(epub_content)} bytes from file")
+        # Validate file size and spool the upload
+        epub_file = await _validate_file_size(file)
 
-        # Convert EPUB to PDF
-        pdf_content = converter.convert(epub_content)
-        logger.info(f"Successfully converted EPUB to PDF ({len(pdf_content)} bytes)")
+        # Convert EPUB to PDF in a worker thread so the event loop keeps serving requests.
+        # WeasyPrint writes straight into the spool, so the PDF is never copied into bytes.
+        pdf_file = SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_SIZE)
+        await run_in_threadpool(converter.convert, epub_file, pdf_file)
+        pdf_size = pdf_file.tell()
+        pdf_file.seek(0)
+        logger.info("Successfully converted EPUB to PDF (%d bytes)", pdf_size)
 
         # Generate output filename with RFC 5987 UTF-8 support
         original_filename = file.filename
         disposition = get_disposition_header(original_filename)
 
-        # Return PDF as streaming response
-        return StreamingResponse(
-            io.BytesIO(pdf_content),
+        # The response owns the spool from here and closes it once it has been sent
+        response = StreamingResponse(
+            _iter_file_chunks(pdf_file),
             media_type="application/pdf",
-            headers={"Content-Disposition": disposition},
+            headers={"Content-Disposition": disposition, "Content-Length": str(pdf_size)},
+            background=BackgroundTask(pdf_file.close),
         )
+        pdf_file = None
+        return response
 
     except HTTPException:
         raise
     except ConversionError as e:
-        logger.error(f"Conversion error: {str(e)}")
+        logger.error("Conversion error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Conversion error: {str(e)}",
         )
     except Exception as e:
-        logger.error(f"Unexpected error during conversion: {str(e)}")
+        logger.error("Unexpected error during conversion: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An unexpected error occurred during conversion",
         )
+    finally:
+        if epub_file is not None:
+            epub_file.close()
+        if pdf_file is not None:
+            pdf_file.close()
 
 
 @router.get("/debug-html")
@@ -153,9 +220,8 @@ async def get_debug_html():
         HTMLResponse: The debug HTML content to view in browser
     """
     try:
-        if os.path.exists(DEBUG_HTML_PATH):
-            with open(DEBUG_HTML_PATH, 'r', encoding='utf-8') as f:
-                content = f.read()
+        if settings.write_debug_html and os.path.exists(DEBUG_HTML_PATH):
+            content = await run_in_threadpool(_read_debug_html)
             logger.info("Debug HTML accessed successfully")
             return HTMLResponse(content=content)
         else:
@@ -168,7 +234,7 @@ async def get_debug_html():
                 }
             )
     except Exception as e:
-        logger.error(f"Error reading debug HTML: {str(e)}")
+        logger.error("Error reading debug HTML: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to read debug.html: {str(e)}"
@@ -185,7 +251,7 @@ async def download_debug():
         FileResponse: The debug HTML file as a download
     """
     try:
-        if os.path.exists(DEBUG_HTML_PATH):
+        if settings.write_debug_html and os.path.exists(DEBUG_HTML_PATH):
             logger.info("Debug HTML file download requested")
             return FileResponse(
                 DEBUG_HTML_PATH,
@@ -201,7 +267,7 @@ async def download_debug():
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error downloading debug HTML: {str(e)}")
+        logger.error("Error downloading debug HTML: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to download debug.html: {str(e)}"
@@ -218,13 +284,12 @@ async def debug_info():
         dict: Debug file information including size, preview, and URLs
     """
     try:
-        if os.path.exists(DEBUG_HTML_PATH):
+        if settings.write_debug_html and os.path.exists(DEBUG_HTML_PATH):
             size = os.path.getsize(DEBUG_HTML_PATH)
             # 读取前 1000 字符作为预览
-            with open(DEBUG_HTML_PATH, 'r', encoding='utf-8') as f:
-                preview = f.read(1000)
+            preview = await run_in_threadpool(_read_debug_html, 1000)
             
-            logger.info(f"Debug info accessed: file size {size} bytes")
+            logger.info("Debug info accessed: file size %d bytes", size)
             return {
                 "file_exists": True,
                 "file_size": f"{size} bytes",
@@ -242,7 +307,7 @@ async def debug_info():
                 "info": "上传 EPUB 文件后，系统会自动生成 debug.html 用于诊断"
             }
     except Exception as e:
-        logger.error(f"Error getting debug info: {str(e)}")
+        logger.error("Error getting debug info: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to get debug info: {str(e)}"
@@ -1,4 +1,5 @@
 import logging
+from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -15,6 +16,15 @@ class Settings(BaseSettings):
     allowed_mime_types: list[str] = ["application/epub+zip", "application/zip"]
     allowed_extensions: list[str] = [".epub"]
 
+    # Debug output: save the generated HTML to /tmp/debug.html on every conversion
+    write_debug_html: bool = False
+
+    # Worker processes used to parse chapters of large books (0 = one per available CPU, at most 4)
+    parse_workers: int = Field(0, ge=0)
+
+    # Start every chapter on a new page; when off, chapters are separated by a gap instead
+    page_break_per_chapter: bool = True
+
     # Logging
     log_level: str = "INFO"
 
@@ -30,4 +40,9 @@ logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
 )
 
+# WeasyPrint logs every laid-out page and every CSS declaration it ignores, which for
+# a large book is thousands of records per conversion; outside debug mode keep its errors only
+if not settings.debug:
+    logging.getLogger("weasyprint").setLevel(logging.ERROR)
+
 logger = logging.getLogger(__name__)
@@ -1,4 +1,5 @@
 import logging
+from contextlib import asynccontextmanager
 from pathlib import Path
 from fastapi import FastAPI, HTTPException, status, Request
 from fastapi.responses import JSONResponse
@@ -8,22 +9,34 @@ from fastapi.templating import Jinja2Templates
 
 from app.core.config import settings
 from app.api.routes import router
+from app.services.converter import shutdown_parse_executor
 
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Stop the chapter parsing worker processes when the server shuts down."""
+    yield
+    shutdown_parse_executor()
+
+
 app = FastAPI(
     title=settings.app_name,
     debug=settings.debug,
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
+# The API is cookie-less, so without credentials Starlette can answer every origin
+# with a static "*" instead of echoing the request's Origin header
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_credentials=False,
+    allow_methods=["GET", "POST"],
+    allow_headers=["Content-Type"],
 )
 
 # Setup static files and templates
@@ -44,7 +57,7 @@ async def home(request: Request):
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc: HTTPException):
     """Handle HTTP exceptions with JSON response."""
-    logger.error(f"HTTP Exception: {exc.status_code} - {exc.detail}")
+    logger.error("HTTP Exception: %s - %s", exc.status_code, exc.detail)
     return JSONResponse(
         status_code=exc.status_code,
         content={"error": exc.detail},
@@ -54,7 +67,7 @@ async def http_exception_handler(request, exc: HTTPException):
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc: Exception):
     """Handle general exceptions with JSON response."""
-    logger.error(f"Unhandled Exception: {str(exc)}")
+    logger.error("Unhandled Exception: %s", exc)
     return JSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={"error": "An unexpected error occurred"},
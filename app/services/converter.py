@@ -3,22 +3,113 @@ import logging
 import os
 import re
 import base64
-from typing import Dict, List, Tuple, Optional
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache, partial
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Tuple, Optional, Union
 from html.parser import HTMLParser
 from html import escape
 from pathlib import Path
 
 import ebooklib
+import tinycss2
 from ebooklib import epub
+from lxml import etree
 from weasyprint import HTML, CSS
 from weasyprint.text.fonts import FontConfiguration
 
+from app.core.config import settings
+
 logger = logging.getLogger(__name__)
 
 ALLOWED_INLINE_TAG_PATTERN = re.compile(
     r'(?i)(</?(?:b|strong|i|em|u|font)(?:\s+[^<>]*?)?>|<br\s*/?>)'
 )
 
+# Formatting tags as they look after escaping: b/strong/i/em/u and their closers,
+# <br>, <br/>, <br />, </font>, and <font color="..."> with the color captured
+ESCAPED_INLINE_TAG_PATTERN = re.compile(
+    r'&lt;(/?(?:b|strong|i|em|u)|br(?: ?/)?|/font|font color=&quot;([^&]*?)&quot;)&gt;'
+)
+
+# Distinct inline style strings whose bold/colour parse results are kept
+STYLE_CACHE_SIZE = 1024
+
+# Text up to this length is escaped through an LRU cache; longer paragraphs rarely repeat
+ESCAPE_CACHE_MAX_CHARS = 256
+
+# Books with at least this many bytes of chapter HTML are parsed in a process pool;
+# below it, process start-up and pickling cost more than they save
+PARALLEL_PARSE_MIN_BYTES = 2 * 1024 * 1024
+
+# Within such a book, only chapters of at least this many bytes go to the pool; smaller
+# ones are parsed in-process while the workers run, since shipping them costs more than parsing
+PARALLEL_PARSE_MIN_CHAPTER_BYTES = 64 * 1024
+
+# Upper bound on the default pool size (PARSE_WORKERS=0); every worker imports WeasyPrint
+DEFAULT_PARSE_WORKERS_MAX = 4
+
+# Leading bytes of raster formats, used to label embedded images with the right MIME type.
+# Keyed by the first byte so sniffing an image is one lookup and one prefix check.
+IMAGE_SIGNATURES = {
+    0x89: ((b'\x89PNG\r\n\x1a\n', 'image/png'),),
+    0xFF: ((b'\xff\xd8\xff', 'image/jpeg'),),
+    ord('G'): ((b'GIF87a', 'image/gif'), (b'GIF89a', 'image/gif')),
+    ord('R'): ((b'RIFF', 'image/webp'),),
+}
+
+# Location of the last generated HTML document, served by the debug endpoints
+DEBUG_HTML_PATH = '/tmp/debug.html'
+
+# Opening-tag prefix and closing tag for each extracted block element written to the HTML
+BLOCK_ELEMENT_TAGS = {
+    tag: (f'<{tag}', f'</{tag}>') for tag in ('h1', 'h2', 'h3', 'p', 'div', 'li')
+}
+
+# Chapters shorter than this (in characters) that contain an <img> are treated as cover pages
+COVER_CHAPTER_MAX_CHARS = 1000
+
+# Matches <style> blocks on raw chapter bytes so only the CSS needs decoding
+STYLE_BLOCK_BYTES_PATTERN = re.compile(rb'(?is)<style[^>]*>(.*?)</style>')
+
+# Opening tags with a class attribute, rewritten by convert_css_classes_to_html()
+TAG_WITH_CLASS_PATTERN = re.compile(
+    r'<(\w+)([^>]*?\s+class="([^"]*)")([^>]*)>',
+    re.IGNORECASE | re.DOTALL
+)
+
+# A class attribute naming a bold or center class; every BOLD_CLASS_KEYWORDS entry
+# contains "bold" or "strong" and every CENTER_CLASS_KEYWORDS entry "center".
+# Chapters without one have nothing for convert_css_classes_to_html() to rewrite.
+KEYWORD_CLASS_PATTERN = re.compile(r'class="[^"]*(?:bold|strong|center)', re.IGNORECASE)
+KEYWORD_CLASS_BYTES_PATTERN = re.compile(KEYWORD_CLASS_PATTERN.pattern.encode(), re.IGNORECASE)
+
+# Attribute and tag patterns used by convert_css_classes_to_html()
+CLASS_ATTR_PATTERN = re.compile(r'\s+class="[^"]*"', re.IGNORECASE)
+ALIGN_ATTR_PATTERN = re.compile(r'\s+align=(?:"[^"]*"|\'[^\']*\')', re.IGNORECASE)
+STYLE_ATTR_PATTERN = re.compile(r'style="([^"]*)"', re.IGNORECASE)
+BOLD_TAG_PATTERN = re.compile(r'<\s*b\s*>|<\s*/\s*b\s*>|<\s*strong\s*>|<\s*/\s*strong\s*>', re.IGNORECASE)
+NESTED_BOLD_OPEN_PATTERN = re.compile(r'<b>(\s*<b>)')
+NESTED_BOLD_CLOSE_PATTERN = re.compile(r'(</b>)\s*</b>')
+
+# Declarations and selector syntax inspected by extract_bold_classes_from_css()
+BOLD_CSS_PROPERTIES = frozenset({'font-weight', 'font'})
+SELECTOR_COMBINATORS = frozenset('>+~')
+CONDITIONAL_AT_RULES = frozenset({'media', 'supports'})
+
+# @import and @namespace rules, dropped from EPUB CSS before rendering
+CSS_IMPORT_NAMESPACE_PATTERN = re.compile(r'@(?:import|namespace)\s+[^;]+;')
+
+# First <img> source in a chapter, used to find image-only cover pages
+IMG_SRC_PATTERN = re.compile(r'<img[^>]+src=["\']([^"\']+)["\']', re.IGNORECASE)
+
+# Substrings of CSS class names that imply bold text or center alignment
+BOLD_CLASS_KEYWORDS = ('bold', 'strong', 'fw-bold', 'font-bold', 'weight-bold')
+CENTER_CLASS_KEYWORDS = ('center', 'centered', 'text-center', 'align-center')
+
 # CSS for PDF styling
 CSS_STYLES = """
 @page {
@@ -153,13 +244,16 @@ img {
 }
 
 /* Chinese/Japanese/Korean font support */
-@font-face {
-    font-family: "WenQuanYi";
-    src: url('/usr/share/fonts/truetype/wqy/wqy-microhei.ttc');
+.wqy-font {
+    font-family: "WenQuanYi Micro Hei", "WenQuanYi Zen Hei", "Noto Sans CJK SC", "Source Han Sans SC", "PingFang SC", "Microsoft YaHei", Arial, sans-serif;
 }
+"""
 
-.wqy-font {
-    font-family: "WenQuanYi", "Noto Sans CJK SC", "Source Han Sans SC", "PingFang SC", "Microsoft YaHei", Arial, sans-serif;
+# Used instead of per-chapter page breaks when settings.page_break_per_chapter is off
+CONTINUOUS_CHAPTERS_CSS = """
+section.chapter {
+    break-after: auto;
+    margin-bottom: 0.4in;
 }
 """
 
@@ -171,16 +265,55 @@ CJK_FONT_PATHS = [
     '/usr/share/fonts/truetype/wqy/wqy-zenhei.ttf',
 ]
 
+# Fontconfig family names of the fonts above, used to reference the installed font
+# by name instead of loading the multi-megabyte file through @font-face
+CJK_FONT_FAMILIES = {
+    '/usr/share/fonts/truetype/wqy/wqy-microhei.ttc': 'WenQuanYi Micro Hei',
+    '/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc': 'WenQuanYi Zen Hei',
+    '/usr/share/fonts/truetype/wqy/wqy-microhei.ttf': 'WenQuanYi Micro Hei',
+    '/usr/share/fonts/truetype/wqy/wqy-zenhei.ttf': 'WenQuanYi Zen Hei',
+}
+
+@lru_cache(maxsize=None)
 def _get_available_cjk_font() -> Optional[str]:
-    """Check if CJK fonts are available and return the path."""
+    """Check if CJK fonts are available and return the path.
+
+    The result is cached so the filesystem is only probed once per process.
+    """
     for font_path in CJK_FONT_PATHS:
         if os.path.exists(font_path):
-            logger.info(f"Found CJK font: {font_path}")
+            logger.info("Found CJK font: %s", font_path)
             return font_path
     logger.warning("No CJK fonts found, CJK characters may not render properly")
     return None
 
 
+def _build_cjk_font_css(font_path: Optional[str]) -> str:
+    """Build CSS putting the installed CJK font in the body font stack, if one is available.
+
+    The font is referenced by its system family name, so Pango opens it once
+    through Fontconfig and the per-thread font map keeps it between documents.
+    WeasyPrint subsets it to the glyphs actually used when writing the PDF.
+    """
+    if not font_path:
+        return ""
+    family = CJK_FONT_FAMILIES.get(font_path, 'WenQuanYi Micro Hei')
+    return f"""
+body {{
+    font-family: "DejaVu Sans", "{family}", Arial, sans-serif;
+}}
+"""
+
+
+@lru_cache(maxsize=None)
+def _get_base_stylesheet() -> CSS:
+    """Return the parsed base stylesheet, including CJK font support, built once per process."""
+    css = CSS_STYLES + _build_cjk_font_css(_get_available_cjk_font())
+    if not settings.page_break_per_chapter:
+        css += CONTINUOUS_CHAPTERS_CSS
+    return CSS(string=css)
+
+
 class FormattingPreservingExtractor(HTMLParser):
     """Extract text with formatting, colors, alignment, and images."""
 
@@ -188,136 +321,212 @@ class FormattingPreservingExtractor(HTMLParser):
     BLOCK_TAGS = HEADING_TAGS.union({'p', 'li', 'div', 'center'})
     LIST_CONTAINER_TAGS = {'ul', 'ol'}
     INLINE_FORMATTING_TAGS = {'b', 'strong', 'i', 'em', 'u'}
+    NON_CONTENT_TAGS = {'script', 'style'}
 
     COLOR_STYLE_PATTERN = re.compile(r'color\s*:\s*([^;]+)', re.IGNORECASE)
-    FONT_WEIGHT_STYLE_PATTERN = re.compile(r'font-weight\s*:\s*([^;]+)', re.IGNORECASE)
-    FONT_SHORTHAND_BOLD_PATTERN = re.compile(r'font\s*:\s*[^;]*\bbold\b', re.IGNORECASE)
+    # font-weight and font shorthand declarations, found in one scan of a style attribute
+    FONT_DECLARATION_PATTERN = re.compile(r'font(-weight)?\s*:\s*([^;]*)', re.IGNORECASE)
+    BOLD_WORD_PATTERN = re.compile(r'\bbold\b', re.IGNORECASE)
+    FONT_WEIGHT_NUMBER_PATTERN = re.compile(r'\s*([0-9]{3})\b')
+    # Colors are validated with set and str checks, which beat a regex on such short strings
+    HEX_DIGITS = frozenset('0123456789abcdefABCDEF')
+    HEX_COLOR_DIGIT_COUNTS = frozenset({3, 4, 6, 8})
 
     BOLD_WRAPPER_TAGS = BLOCK_TAGS.union({'span', 'font'})
 
-    def __init__(self, bold_classes: Optional[set[str]] = None):
+    def __init__(self, bold_classes: Optional[Iterable[str]] = None, *, _lowercased: bool = False):
+        # Internal callers pass the book's frozenset from _extract_bold_classes() with
+        # _lowercased=True, so one set is shared by every chapter instead of being rebuilt
+        if not _lowercased:
+            bold_classes = frozenset(c.lower() for c in bold_classes or ())
+        self.bold_classes = bold_classes
+        self._lxml_parser = None
+        # HTMLParser.__init__ calls reset(), which initializes the extraction state
         super().__init__(convert_charrefs=True)
-        self.elements: List[Tuple[str, object]] = []
+
+    def reset(self):
+        """Clear all extraction state so the instance can be reused for another document."""
+        super().reset()
+        # (type, text, attrs) for blocks and ('img', src, {}) for images
+        self.elements: List[Tuple[str, str, Dict[str, str]]] = []
         self.current_text: List[str] = []
+        # Bound once: text and markup are appended several times per inline tag
+        self._write_text = self.current_text.append
         self.current_tag: Optional[str] = None
         self.current_attrs: Dict[str, str] = {}
         self.font_stack: List[bool] = []
         self.bold_stack: List[bool] = []
-        self.bold_classes = {c.lower() for c in (bold_classes or set())}
+        self._skip_depth = 0
 
     def handle_starttag(self, tag, attrs):
-        tag = tag.lower()
         attrs_dict = {
             k.lower(): v for k, v in attrs
             if isinstance(k, str) and v is not None
         }
+        self._start_element(tag.lower(), attrs_dict)
+
+    def _start_element(self, tag: str, attrs_dict: Dict[str, str]):
+        """Handle an opening tag; ``tag`` and attribute names must already be lowercase."""
+        if tag in self.NON_CONTENT_TAGS:
+            self._skip_depth += 1
+            return
 
         if tag in self.BLOCK_TAGS:
-            self._flush_text()
-            if tag in self.HEADING_TAGS:
-                self.current_tag = tag
-            elif tag == 'li':
-                self.current_tag = 'li'
-            elif tag == 'div':
-                self.current_tag = 'div'
-            elif tag == 'center':
-                self.current_tag = 'center'
-            else:
-                self.current_tag = 'p'
-            self.current_attrs = dict(attrs_dict)
+            if self.current_text:
+                self._flush_text()
+            # Every block tag is also the element type it produces
+            self.current_tag = tag
+            # Attribute dicts are never mutated once stored, so blocks share them by reference.
+            # lxml passes one shared read-only mapping for attribute-less tags; store a real dict.
+            self.current_attrs = attrs_dict or {}
         elif tag in self.LIST_CONTAINER_TAGS:
-            self._flush_text()
+            if self.current_text:
+                self._flush_text()
             self.current_tag = None
             self.current_attrs = {}
 
+        # Only a style or class attribute can make a wrapper bold, so bare tags skip the checks
         has_bold = False
-        if tag in self.BOLD_WRAPPER_TAGS and tag not in {'b', 'strong'}:
+        if attrs_dict and tag in self.BOLD_WRAPPER_TAGS:
             has_bold = self._attrs_indicate_bold(attrs_dict)
 
         if tag in {'b', 'strong'}:
-            self.current_text.append('<b>')
+            self._write_text('<b>')
         elif tag in {'i', 'em'}:
-            self.current_text.append('<i>')
+            self._write_text('<i>')
         elif tag == 'u':
-            self.current_text.append('<u>')
+            self._write_text('<u>')
         elif tag == 'font':
             color = self._normalize_color(attrs_dict.get('color'))
             if not color:
                 color = self._extract_color_from_style(attrs_dict.get('style', ''))
             has_font = bool(color)
             if color:
-                self.current_text.append(f'<font color="{color}">')
+                self._write_text(f'<font color="{color}">')
             self.font_stack.append(has_font)
 
             if has_bold:
-                self.current_text.append('<b>')
+                self._write_text('<b>')
             self.bold_stack.append(has_bold)
         elif tag == 'span':
             color = self._extract_color_from_style(attrs_dict.get('style', ''))
             has_font = bool(color)
             if color:
-                self.current_text.append(f'<font color="{color}">')
+                self._write_text(f'<font color="{color}">')
             self.font_stack.append(has_font)
 
             if has_bold:
-                self.current_text.append('<b>')
+                self._write_text('<b>')
             self.bold_stack.append(has_bold)
         elif tag == 'br':
-            self.current_text.append('<br/>')
+            self._write_text('<br/>')
         elif tag == 'img':
-            self._flush_text()
+            if self.current_text:
+                self._flush_text()
             src = attrs_dict.get('src') or ''
             if src:
-                self.elements.append(('img', {
-                    'src': src,
-                }))
+                self.elements.append(('img', src, {}))
         else:
-            if tag in self.BOLD_WRAPPER_TAGS and tag not in {'b', 'strong'}:
+            if tag in self.BOLD_WRAPPER_TAGS:
                 if has_bold:
-                    self.current_text.append('<b>')
+                    self._write_text('<b>')
                 self.bold_stack.append(has_bold)
 
+    @classmethod
+    def parse(cls, html: str, bold_classes: Optional[Iterable[str]] = None) -> 'FormattingPreservingExtractor':
+        """Extract elements from ``html`` using libxml2's C tokenizer.
+
+        Produces the same ``elements`` as ``feed()`` + ``close()``, but the
+        markup is tokenized by lxml instead of the pure-Python HTMLParser.
+        """
+        extractor = cls(bold_classes=bold_classes)
+        extractor.parse_html(html)
+        return extractor
+
+    def parse_html(self, html: Union[str, bytes]) -> List[Tuple[str, str, Dict[str, str]]]:
+        """Reset state, extract elements from ``html`` with lxml and return them.
+
+        ``html`` may be text or raw UTF-8 bytes. Invalid UTF-8 sequences are
+        dropped, as when chapters are decoded with errors='ignore', rather than
+        becoming U+FFFD. The extractor and its lxml parser are reusable, so one
+        instance can process every chapter of a book.
+        """
+        self.reset()
+        if isinstance(html, bytes) and not html.isascii():
+            try:
+                html.decode('utf-8')
+            except UnicodeDecodeError:
+                html = html.decode('utf-8', errors='ignore')
+        if html:
+            if self._lxml_parser is None:
+                self._lxml_parser = etree.HTMLParser(target=_ExtractorTarget(self), encoding='utf-8')
+            try:
+                if isinstance(html, bytes):
+                    # One-shot parse of the whole buffer; quicker than libxml2's push parser
+                    etree.fromstring(html, self._lxml_parser)
+                else:
+                    # Text may start with an XML encoding declaration, which fromstring() rejects
+                    self._lxml_parser.feed(html)
+                    self._lxml_parser.close()
+            except Exception:
+                # Don't reuse a parser left in an unknown state
+                self._lxml_parser = None
+                raise
+        # html.parser's close() has nothing buffered here; only pending text needs flushing
+        self._flush_text()
+        return self.elements
+
     def handle_startendtag(self, tag, attrs):
         tag = tag.lower()
         if tag == 'br':
-            self.current_text.append('<br/>')
+            self._write_text('<br/>')
         elif tag == 'img':
             self.handle_starttag(tag, attrs)
 
     def handle_endtag(self, tag):
-        tag = tag.lower()
+        self._end_element(tag.lower())
+
+    def _end_element(self, tag: str):
+        """Handle a closing tag; ``tag`` must already be lowercase."""
+        if tag in self.NON_CONTENT_TAGS:
+            if self._skip_depth:
+                self._skip_depth -= 1
+            return
 
-        if tag in self.BOLD_WRAPPER_TAGS and tag not in {'b', 'strong'}:
+        if tag in self.BOLD_WRAPPER_TAGS:
             if self.bold_stack:
                 had_bold = self.bold_stack.pop()
                 if had_bold:
-                    self.current_text.append('</b>')
+                    self._write_text('</b>')
 
         if tag in {'b', 'strong'}:
-            self.current_text.append('</b>')
+            self._write_text('</b>')
         elif tag in {'i', 'em'}:
-            self.current_text.append('</i>')
+            self._write_text('</i>')
         elif tag == 'u':
-            self.current_text.append('</u>')
+            self._write_text('</u>')
         elif tag in {'font', 'span'}:
             if self.font_stack:
                 has_font = self.font_stack.pop()
                 if has_font:
-                    self.current_text.append('</font>')
+                    self._write_text('</font>')
         elif tag == 'br':
-            self.current_text.append('<br/>')
+            self._write_text('<br/>')
         elif tag in self.BLOCK_TAGS or tag in self.LIST_CONTAINER_TAGS:
-            self._flush_text()
+            if self.current_text:
+                self._flush_text()
             self.current_tag = None
             self.current_attrs = {}
 
     def handle_data(self, data):
-        if not data:
+        if not data or self._skip_depth:
+            return
+        # Indentation between tags would only be stripped again by _flush_text, so don't
+        # start buffering text until something other than whitespace arrives
+        if not self.current_text and data.isspace():
             return
-        normalized = data.replace('\xa0', ' ')
-        normalized = re.sub(r'\s+', ' ', normalized)
-        if normalized:
-            self.current_text.append(normalized)
+        # Whitespace (including non-breaking spaces) is collapsed once per block in _flush_text
+        self._write_text(data)
 
     def close(self):
         super().close()
@@ -327,30 +536,40 @@ class FormattingPreservingExtractor(HTMLParser):
         if not self.current_text:
             return
         text = ''.join(self.current_text)
-        text = re.sub(r'\s+', ' ', text)
-        text = text.strip()
+        # Printable text has no whitespace besides ' ', so without doubled or edge spaces
+        # it is already collapsed; otherwise str.split() collapses and trims Unicode
+        # whitespace (\xa0 included) in one C pass
+        if not (text.isprintable() and '  ' not in text
+                and not text.startswith(' ') and not text.endswith(' ')):
+            text = ' '.join(text.split())
         if text:
-            attrs_copy = dict(self.current_attrs)
-            self.elements.append((self.current_tag or 'p', text, attrs_copy))
-        self.current_text = []
+            self.elements.append((self.current_tag or 'p', text, self.current_attrs))
+        # Cleared in place so the same list is reused for every block
+        self.current_text.clear()
 
+    # Inline styles repeat across thousands of spans, so parsed results are cached per style string
     @classmethod
+    @lru_cache(maxsize=STYLE_CACHE_SIZE)
     def _style_indicates_bold(cls, style: Optional[str]) -> bool:
         if not style:
             return False
 
-        if cls.FONT_SHORTHAND_BOLD_PATTERN.search(style):
-            return True
-
-        match = cls.FONT_WEIGHT_STYLE_PATTERN.search(style)
-        if not match:
+        # A bold font shorthand anywhere wins; otherwise the first font-weight decides
+        weight = None
+        for is_weight, declared in cls.FONT_DECLARATION_PATTERN.findall(style):
+            if not is_weight:
+                if cls.BOLD_WORD_PATTERN.search(declared):
+                    return True
+            elif weight is None and declared:
+                weight = declared
+        if weight is None:
             return False
 
-        value = match.group(1).split('!important')[0].strip().lower()
+        value = weight.split('!important')[0].strip().lower()
         if value in {'bold', 'bolder'}:
             return True
 
-        num_match = re.match(r'\s*([0-9]{3})\b', value)
+        num_match = cls.FONT_WEIGHT_NUMBER_PATTERN.match(value)
         if num_match:
             try:
                 return int(num_match.group(1)) >= 600
@@ -364,24 +583,22 @@ class FormattingPreservingExtractor(HTMLParser):
         if self._style_indicates_bold(style):
             return True
 
-        class_attr = attrs.get('class') or ''
-        class_names = [c.strip().lower() for c in class_attr.split() if c.strip()]
-        if not class_names:
+        class_attr = attrs.get('class')
+        if not class_attr:
             return False
 
-        if any(c in self.bold_classes for c in class_names):
+        # Classes named like the common bold classes (bold, fw-bold, font-bold, strong, ...);
+        # one substring scan of the whole attribute covers every name in it
+        class_attr = class_attr.lower()
+        if 'bold' in class_attr or 'strong' in class_attr:
             return True
 
-        # Heuristic: common class names used for bold text in EPUB/CSS.
-        for c in class_names:
-            if c in {'bold', 'fw-bold', 'font-bold', 'strong'}:
-                return True
-            if 'bold' in c or 'strong' in c:
-                return True
-
-        return False
+        # Classes bolded by the book's CSS; most books have none, so most tags never split
+        bold_classes = self.bold_classes
+        return bool(bold_classes) and not bold_classes.isdisjoint(class_attr.split())
 
     @classmethod
+    @lru_cache(maxsize=STYLE_CACHE_SIZE)
     def _extract_color_from_style(cls, style: Optional[str]) -> Optional[str]:
         if not style:
             return None
@@ -392,10 +609,13 @@ class FormattingPreservingExtractor(HTMLParser):
         color = color.split('!important')[0].strip()
         return cls._normalize_color(color)
 
-    @staticmethod
-    def _normalize_color(color: Optional[str]) -> Optional[str]:
+    @classmethod
+    def _normalize_color(cls, color: Optional[str]) -> Optional[str]:
         if not color:
             return None
+        # Fast path for the common already-clean "#rgb"/"#rrggbb" forms
+        if color[0] == '#' and cls._is_hex_digits(color[1:]):
+            return color
         color = color.strip().strip('"\'')
         if not color:
             return None
@@ -404,18 +624,71 @@ class FormattingPreservingExtractor(HTMLParser):
             return None
         base_color = base_color.replace(' ', '')
         if base_color.startswith('#'):
-            if re.fullmatch(r'#([0-9a-fA-F]{3}|[0-9a-fA-F]{4}|[0-9a-fA-F]{6}|[0-9a-fA-F]{8})', base_color):
-                return base_color
-            return None
-        hex_match = re.fullmatch(r'([0-9a-fA-F]{3}|[0-9a-fA-F]{4}|[0-9a-fA-F]{6}|[0-9a-fA-F]{8})', base_color)
-        if hex_match:
-            return f"#{hex_match.group(1)}"
+            return base_color if cls._is_hex_digits(base_color[1:]) else None
+        if cls._is_hex_digits(base_color):
+            return f"#{base_color}"
         if base_color.lower().startswith('rgb'):
             return base_color.lower()
-        if re.fullmatch(r'[a-zA-Z]+', base_color):
+        # Named colors: ASCII letters only
+        if base_color.isascii() and base_color.isalpha():
             return base_color.lower()
         return None
 
+    @classmethod
+    def _is_hex_digits(cls, value: str) -> bool:
+        """Check whether ``value`` is the 3, 4, 6 or 8 hex digits of a color."""
+        return len(value) in cls.HEX_COLOR_DIGIT_COUNTS and cls.HEX_DIGITS.issuperset(value)
+
+
+class _ExtractorTarget:
+    """lxml parser target that forwards events to FormattingPreservingExtractor handlers.
+
+    libxml2 already lowercases tag and attribute names and never reports
+    valueless attributes as None, so start tags skip the normalization
+    handle_starttag() does for html.parser and go straight to the extractor.
+    """
+
+    __slots__ = ('extractor', 'data', 'start')
+
+    def __init__(self, extractor: FormattingPreservingExtractor):
+        self.extractor = extractor
+        # Text and start tags are the most frequent events, so lxml calls those handlers directly
+        self.data = extractor.handle_data
+        self.start = extractor._start_element
+
+    def end(self, tag):
+        # <br> is void: its start event already emitted the line break
+        if tag != 'br':
+            self.extractor._end_element(tag)
+
+    def close(self):
+        return None
+
+
+def _sniff_image_mime_type(data: bytes) -> str:
+    """Guess an image's MIME type from its leading bytes, defaulting to PNG."""
+    for signature, mime_type in IMAGE_SIGNATURES.get(data[0] if data else None, ()):
+        if data.startswith(signature):
+            if mime_type == 'image/webp' and data[8:12] != b'WEBP':
+                continue
+            return mime_type
+    head = data[:256].lstrip()
+    if head.startswith((b'<svg', b'<?xml')) and b'<svg' in data[:1024]:
+        return 'image/svg+xml'
+    return 'image/png'
+
+
+def _iter_style_blocks(content: bytes):
+    """Yield the decoded contents of <style> blocks in raw chapter bytes.
+
+    Scanning the bytes directly avoids decoding the whole chapter body just to
+    pull out its (usually small or absent) inline CSS.
+    """
+    if not content:
+        return
+    for match in STYLE_BLOCK_BYTES_PATTERN.finditer(content):
+        yield match.group(1).decode('utf-8', errors='ignore')
+
 
 def _remove_nested_bold_tags(html_str: str) -> str:
     """Remove nested bold tags like <b><b>...</b></b> to avoid duplication.
@@ -424,175 +697,343 @@ def _remove_nested_bold_tags(html_str: str) -> str:
     """
     # Pattern to match nested <b> tags: <b>...<b>...</b>...</b>
     # This is a simple approach that removes one layer of nesting
-    html_str = re.sub(r'<b>(\s*<b>)', r'\1', html_str)
-    html_str = re.sub(r'(</b>)\s*</b>', r'\1', html_str)
+    html_str = NESTED_BOLD_OPEN_PATTERN.sub(r'\1', html_str)
+    html_str = NESTED_BOLD_CLOSE_PATTERN.sub(r'\1', html_str)
     return html_str
 
 
+def _center_align_attrs(attrs: str) -> str:
+    """Add align="center" and style="text-align: center" to a tag's attributes."""
+    # Add center alignment with both align attribute and style for maximum compatibility
+    if 'align=' in attrs.lower():
+        # Replace existing align attribute
+        attrs = ALIGN_ATTR_PATTERN.sub('', attrs)
+    attrs = attrs + ' align="center"'
+
+    # Also add style with text-align: center for WeasyPrint
+    if 'style=' in attrs.lower():
+        # Update existing style attribute
+        return STYLE_ATTR_PATTERN.sub(
+            lambda m: f'style="{m.group(1).rstrip(";")}; text-align: center;"',
+            attrs,
+            count=1
+        )
+    return attrs + ' style="text-align: center;"'
+
+
+def _center_class_tag(match: re.Match) -> str:
+    """Rewrite one class-bearing opening tag, centering it if a class asks for it."""
+    tag, attrs, class_value, remaining_attrs = match.groups()
+    if any(_is_center_class(c) for c in class_value.split()):
+        attrs = _center_align_attrs(attrs)
+    return f'<{tag}{attrs}{remaining_attrs}>'
+
+
+def _center_class_tags(html_str: str) -> str:
+    """Apply _center_class_tag() to every class-bearing opening tag in html_str."""
+    return TAG_WITH_CLASS_PATTERN.sub(_center_class_tag, html_str)
+
+
 def convert_css_classes_to_html(html_content: str) -> str:
     """Convert CSS class formatting to HTML tags for WeasyPrint.
     
     This function converts:
     1. CSS classes indicating bold (bold, fw-bold, font-bold, strong) to <b> tags
     2. CSS classes indicating center alignment (center, centered, text-center) to align="center" attribute
+
+    Both rewrites happen in a single scan over the class-bearing tags.
     """
-    
-    # Pattern to match opening tags with class attributes
-    tag_with_class_pattern = re.compile(
-        r'<(\w+)([^>]*?\s+class="([^"]*)")([^>]*)>',
-        re.IGNORECASE | re.DOTALL
-    )
-    
-    # Process bold classes by wrapping content with <b> tags
-    def wrap_bold_content(html_str):
-        """Wrap content of bold-class elements with <b> tags."""
-        result = []
-        i = 0
-        while i < len(html_str):
-            match = tag_with_class_pattern.search(html_str, i)
-            if not match:
-                result.append(html_str[i:])
-                break
-                
-            tag, attrs, class_value, remaining_attrs = match.groups()
-            class_names = [c.strip().lower() for c in class_value.split() if c.strip()]
-            
-            # Check for bold classes
-            has_bold_class = any(_is_bold_class(c) for c in class_names)
-            
-            if has_bold_class:
-                # Add opening tag (remove bold classes from attribute list)
-                remaining_classes = [c for c in class_names if not _is_bold_class(c)]
-                
-                # Reconstruct opening tag attributes without bold classes
-                # attrs includes ' class="value"' so we need to replace it
-                if remaining_classes:
-                    new_class_attr = f' class="{" ".join(remaining_classes)}"'
-                    # Replace the old class attribute with the new one
-                    attrs_without_class = re.sub(
-                        r'\s+class="[^"]*"',
-                        new_class_attr,
-                        attrs,
-                        flags=re.IGNORECASE,
-                        count=1
-                    )
-                else:
-                    # Remove the class attribute entirely
-                    attrs_without_class = re.sub(
-                        r'\s+class="[^"]*"',
-                        '',
-                        attrs,
-                        flags=re.IGNORECASE,
-                        count=1
-                    )
-                
-                result.append(html_str[i:match.start()])
-                result.append(f'<{tag}{attrs_without_class}{remaining_attrs}>')
-                
-                # Find closing tag and wrap content
-                closing_tag = f'</{tag}>'
-                close_pos = html_str.find(closing_tag, match.end())
-                if close_pos != -1:
-                    content_between = html_str[match.end():close_pos]
-                    
-                    # Check if content already has bold tags to avoid nesting
-                    has_bold_tag = bool(re.search(r'<\s*b\s*>|<\s*/\s*b\s*>|<\s*strong\s*>|<\s*/\s*strong\s*>', content_between, re.IGNORECASE))
-                    
-                    if not has_bold_tag:
-                        # Only wrap with <b> if content doesn't already have bold tags
-                        result.append('<b>')
-                        result.append(content_between)
-                        result.append('</b>')
-                    else:
-                        # Content already has bold tags, just add it as-is
-                        result.append(content_between)
-                    
-                    result.append(closing_tag)
-                    i = close_pos + len(closing_tag)
-                else:
-                    # Malformed HTML, just add the match and continue
-                    result.append(html_str[match.end():match.end() + 100] + '...')
-                    i = match.end() + 100
+    if not KEYWORD_CLASS_PATTERN.search(html_content):
+        return html_content
+
+    result = []
+    append = result.append
+    search = TAG_WITH_CLASS_PATTERN.search
+    i = 0
+    while match := search(html_content, i):
+        tag, attrs, class_value, remaining_attrs = match.groups()
+        class_names = class_value.lower().split()
+
+        if not any(_is_bold_class(c) for c in class_names):
+            append(html_content[i:match.start()])
+            append(_center_class_tag(match))
+            i = match.end()
+            continue
+
+        # Drop the bold classes from the opening tag, keeping any others
+        remaining_classes = [c for c in class_names if not _is_bold_class(c)]
+        if remaining_classes:
+            attrs = CLASS_ATTR_PATTERN.sub(f' class="{" ".join(remaining_classes)}"', attrs, count=1)
+            if any(_is_center_class(c) for c in remaining_classes):
+                attrs = _center_align_attrs(attrs)
+        else:
+            attrs = CLASS_ATTR_PATTERN.sub('', attrs, count=1)
+
+        append(html_content[i:match.start()])
+        append(f'<{tag}{attrs}{remaining_attrs}>')
+
+        # Find closing tag and wrap content
+        closing_tag = f'</{tag}>'
+        close_pos = html_content.find(closing_tag, match.end())
+        if close_pos != -1:
+            content_between = _center_class_tags(html_content[match.end():close_pos])
+
+            # Only wrap with <b> if content doesn't already have bold tags
+            if BOLD_TAG_PATTERN.search(content_between) is None:
+                append('<b>')
+                append(content_between)
+                append('</b>')
             else:
-                result.append(html_str[i:match.end()])
-                i = match.end()
-        
-        return ''.join(result)
-    
-    # Process center classes by adding align attribute and style
-    def add_center_alignment(html_str):
-        """Add align="center" and style="text-align: center" to elements with center classes."""
-        def replace_tag(match):
-            tag, attrs, class_value, remaining_attrs = match.groups()
-            class_names = [c.strip().lower() for c in class_value.split() if c.strip()]
-            
-            has_center_class = any(_is_center_class(c) for c in class_names)
-            
-            if has_center_class:
-                # Add center alignment with both align attribute and style for maximum compatibility
-                if 'align=' in attrs.lower():
-                    # Replace existing align attribute
-                    attrs = re.sub(r'\s+align="[^"]*"', '', attrs, flags=re.IGNORECASE)
-                    attrs = re.sub(r'\s+align=\'[^\']*\'', '', attrs, flags=re.IGNORECASE)
-                    attrs = attrs + f' align="center"'
-                else:
-                    attrs = attrs + f' align="center"'
-                
-                # Also add style with text-align: center for WeasyPrint
-                if 'style=' in attrs.lower():
-                    # Update existing style attribute
-                    attrs = re.sub(
-                        r'style="([^"]*)"',
-                        lambda m: f'style="{m.group(1).rstrip(";")}; text-align: center;"',
-                        attrs,
-                        flags=re.IGNORECASE,
-                        count=1
-                    )
-                else:
-                    attrs = attrs + f' style="text-align: center;"'
-            
-            return f'<{tag}{attrs}{remaining_attrs}>'
-        
-        return tag_with_class_pattern.sub(replace_tag, html_str)
-    
-    # Apply transformations
-    result = wrap_bold_content(html_content)
-    result = add_center_alignment(result)
-    
+                append(content_between)
+
+            append(closing_tag)
+            i = close_pos + len(closing_tag)
+        else:
+            # Malformed HTML, just add the match and continue
+            append(_center_class_tags(html_content[match.end():match.end() + 100] + '...'))
+            i = match.end() + 100
+    append(html_content[i:])
+
     # Clean up any remaining nested bold tags
-    result = _remove_nested_bold_tags(result)
-    
-    return result
+    return _remove_nested_bold_tags(''.join(result))
 
 
 def _is_bold_class(class_name: str) -> bool:
     """Check if a CSS class name indicates bold text."""
     class_name = class_name.lower()
-    bold_keywords = ['bold', 'strong', 'fw-bold', 'font-bold', 'weight-bold']
-    return any(keyword in class_name for keyword in bold_keywords)
+    return any(keyword in class_name for keyword in BOLD_CLASS_KEYWORDS)
 
 
 def _is_center_class(class_name: str) -> bool:
     """Check if a CSS class name indicates center alignment."""
     class_name = class_name.lower()
-    center_keywords = ['center', 'centered', 'text-center', 'align-center']
-    return any(keyword in class_name for keyword in center_keywords)
+    return any(keyword in class_name for keyword in CENTER_CLASS_KEYWORDS)
+
+
+def _declarations_indicate_bold(content: list) -> bool:
+    """Check whether a rule's declaration block sets a bold font weight."""
+    for declaration in tinycss2.parse_declaration_list(content, skip_comments=True, skip_whitespace=True):
+        if declaration.type == 'declaration' and declaration.lower_name in BOLD_CSS_PROPERTIES:
+            style = f'{declaration.lower_name}: {tinycss2.serialize(declaration.value)}'
+            if FormattingPreservingExtractor._style_indicates_bold(style):
+                return True
+    return False
+
+
+def _selector_subject_classes(prelude: list) -> Iterator[str]:
+    """Yield the classes of the subject (rightmost compound) of each selector in a rule prelude."""
+    classes = []
+    after_combinator = False
+    after_dot = False
+    for token in prelude:
+        if token.type == 'whitespace' or (token.type == 'literal' and token.value in SELECTOR_COMBINATORS):
+            # Only a combinator if another compound follows; trailing whitespace is not
+            after_combinator = True
+        elif token.type == 'literal' and token.value == ',':
+            yield from classes
+            classes = []
+            after_combinator = False
+        else:
+            if after_combinator:
+                classes = []
+                after_combinator = False
+            if after_dot and token.type == 'ident':
+                classes.append(token.value)
+        after_dot = token.type == 'literal' and token.value == '.'
+    yield from classes
+
+
+def _collect_bold_classes(rules: list, bold_classes: set[str]) -> None:
+    """Add the subject classes of every bold rule in ``rules``, descending into conditional at-rules."""
+    for rule in rules:
+        if rule.type == 'qualified-rule':
+            if _declarations_indicate_bold(rule.content):
+                bold_classes.update(_selector_subject_classes(rule.prelude))
+        elif rule.type == 'at-rule' and rule.content is not None and rule.lower_at_keyword in CONDITIONAL_AT_RULES:
+            _collect_bold_classes(
+                tinycss2.parse_rule_list(rule.content, skip_comments=True, skip_whitespace=True),
+                bold_classes,
+            )
 
 
 def extract_bold_classes_from_css(css_content: str) -> set[str]:
-    """Extract CSS class names that imply bold text from CSS content."""
+    """Extract CSS class names that imply bold text from CSS content.
+
+    The stylesheet is tokenized with tinycss2, so malformed or deeply nested
+    CSS cannot make the scan backtrack.
+    """
     bold_classes = set()
-    
-    # Pattern to match class selectors with font-weight: bold
-    bold_pattern = re.compile(r'\.([\w-]+)[^{]*\{[^}]*font-weight\s*:\s*bold', re.IGNORECASE)
-    
-    for match in bold_pattern.finditer(css_content):
-        class_name = match.group(1)
-        bold_classes.add(class_name)
-    
+    _collect_bold_classes(
+        tinycss2.parse_stylesheet(css_content, skip_comments=True, skip_whitespace=True),
+        bold_classes,
+    )
     return bold_classes
 
 
+def _restore_inline_tag(match: re.Match) -> str:
+    """Turn one escaped formatting tag matched by ESCAPED_INLINE_TAG_PATTERN back into markup."""
+    color = match.group(2)
+    if color is not None:
+        return f'<span style="color: {color};">'
+    tag = match.group(1)
+    return '</span>' if tag == '/font' else f'<{tag}>'
+
+
+def _escape_markup(text: str) -> str:
+    """Escape text for HTML, then restore the inline formatting tags the extractor emits.
+
+    <font color="..."> becomes a colored <span>; all restored tags are put back
+    in a single regex pass over the escaped text.
+    """
+    return ESCAPED_INLINE_TAG_PATTERN.sub(_restore_inline_tag, escape(text))
+
+
+# Cached variant of _escape_markup() for short, frequently repeated strings
+_escape_markup_cached = lru_cache(maxsize=4096)(_escape_markup)
+
+
+def escape_formatted_text(text: str) -> str:
+    """Escape text while preserving formatting tags.
+
+    This escapes HTML special characters but preserves allowed formatting tags
+    like <b>, <strong>, <i>, <em>, <u>, <font>, and <br>.
+    """
+    # Plain text without markup or special characters needs no escaping; five single-character
+    # substring tests are several times faster than a character-class regex search
+    if not ('<' in text or '&' in text or '>' in text or '"' in text or "'" in text):
+        return text
+
+    # Short strings such as headings and list labels repeat a lot, so their results are cached
+    if len(text) <= ESCAPE_CACHE_MAX_CHARS:
+        return _escape_markup_cached(text)
+    return _escape_markup(text)
+
+
+@lru_cache(maxsize=1)
+def _get_worker_extractor(bold_classes: frozenset[str]) -> FormattingPreservingExtractor:
+    """Return the extractor a parse worker process reuses for every chapter of a book."""
+    return FormattingPreservingExtractor(bold_classes=bold_classes, _lowercased=True)
+
+
+def _parse_chapter(
+    content: bytes,
+    bold_classes: frozenset[str],
+    extractor: Optional[FormattingPreservingExtractor] = None,
+) -> List[Tuple[str, str, Dict[str, str]]]:
+    """Convert one chapter's raw HTML bytes into extractor elements.
+
+    Kept at module level so it can run in a worker process.
+    """
+    if extractor is None:
+        extractor = _get_worker_extractor(bold_classes)
+    # Convert CSS classes to HTML tags; chapters without bold or center classes go to lxml undecoded
+    if KEYWORD_CLASS_BYTES_PATTERN.search(content):
+        content = convert_css_classes_to_html(content.decode('utf-8', errors='ignore'))
+    return extractor.parse_html(content)
+
+
+@lru_cache(maxsize=STYLE_CACHE_SIZE)
+def _attrs_markup(attrs: Tuple[Tuple[str, str], ...]) -> str:
+    """Render block attributes as escaped markup; books reuse a handful of attribute sets."""
+    return ''.join(f' {key}="{escape(value)}"' for key, value in attrs)
+
+
+def _render_chapter(
+    content: bytes,
+    bold_classes: frozenset[str],
+    extractor: Optional[FormattingPreservingExtractor] = None,
+) -> Tuple[List[str], List[Tuple[int, str]]]:
+    """Parse one chapter and render its elements as HTML markup.
+
+    Images need the book's resources, so they are left as empty slots and
+    returned as (index, src) pairs for the caller to fill in. Kept at module
+    level so the whole chapter can be rendered in a worker process.
+    """
+    parts = []
+    images = []
+    escape_text = escape_formatted_text
+    block_element_tags = BLOCK_ELEMENT_TAGS
+    # Every element is a (type, text or image src, attrs) triple
+    for element_type, value, attrs in _parse_chapter(content, bold_classes, extractor):
+        # Text blocks are by far the most common element, so one table lookup
+        # both identifies them and yields their markup
+        block_tags = block_element_tags.get(element_type)
+        if block_tags is not None:
+            open_tag, close_tag = block_tags
+            text = escape_text(value)
+            if attrs:
+                parts.append(f'{open_tag}{_attrs_markup(tuple(attrs.items()))}>{text}{close_tag}')
+            else:
+                parts.append(f'{open_tag}>{text}{close_tag}')
+        elif element_type == 'img':
+            images.append((len(parts), value))
+            parts.append('')
+        elif element_type == 'center':
+            parts.append(f'<div align="center">{escape_text(value)}</div>')
+    return parts, images
+
+
+# Process pool that parses chapters of large books; started on first use and
+# dropped again if it breaks, so the next large book starts a fresh one.
+# Guarded by the lock, since conversions run on several threadpool threads.
+_parse_executor: Optional[ProcessPoolExecutor] = None
+_parse_executor_lock = threading.Lock()
+
+
+def _default_parse_workers() -> int:
+    """Return the pool size used when PARSE_WORKERS is 0.
+
+    This is the number of CPUs the process may run on, which unlike
+    os.cpu_count() honors container cpusets, capped at DEFAULT_PARSE_WORKERS_MAX.
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    return min(cpus, DEFAULT_PARSE_WORKERS_MAX)
+
+
+def _get_parse_executor() -> ProcessPoolExecutor:
+    """Return the process pool used to parse chapters of large books, creating it on first use."""
+    global _parse_executor
+    with _parse_executor_lock:
+        if _parse_executor is None:
+            # spawn, not fork: conversions run on worker threads of a live server process
+            _parse_executor = ProcessPoolExecutor(
+                max_workers=settings.parse_workers or _default_parse_workers(),
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _parse_executor
+
+
+def _discard_parse_executor(executor: ProcessPoolExecutor) -> None:
+    """Forget a broken pool so later conversions do not keep submitting to it."""
+    global _parse_executor
+    with _parse_executor_lock:
+        if _parse_executor is executor:
+            _parse_executor = None
+            logger.warning("Chapter parsing pool broke; affected chapters are parsed in-process")
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _pooled_result(executor: ProcessPoolExecutor, future: Future, fallback: Callable):
+    """Return a pool future's result, or call ``fallback`` in-process if the pool broke."""
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        _discard_parse_executor(executor)
+        return fallback()
+
+
+def shutdown_parse_executor() -> None:
+    """Shut down the chapter parsing pool if it was started; a later conversion starts a new one."""
+    global _parse_executor
+    with _parse_executor_lock:
+        if _parse_executor is not None:
+            _parse_executor.shutdown(wait=True, cancel_futures=True)
+            _parse_executor = None
+
+
 class ConversionError(Exception):
     """Custom exception for conversion errors."""
     pass
@@ -604,72 +1045,91 @@ class EPUBToPDFConverter:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         self.cjk_font_path = _get_available_cjk_font()
+        # Base styles never change, so every converter shares one parsed copy
+        self.base_stylesheet = _get_base_stylesheet()
+        self._thread_state = threading.local()
+
+    def _get_font_config(self) -> FontConfiguration:
+        """Return this thread's FontConfiguration, creating it on first use.
+
+        Building one loads the whole Fontconfig setup, and its Pango font map
+        caches fonts between documents. Stylesheets here are parsed without a
+        font config, so no @font-face fonts pile up in it. Each worker thread
+        keeps its own, because Pango font maps are not shared across threads.
+        """
+        font_config = getattr(self._thread_state, 'font_config', None)
+        if font_config is None:
+            font_config = self._thread_state.font_config = FontConfiguration()
+        return font_config
 
-    def convert(self, epub_content) -> bytes:
+    def convert(self, epub_content, output: Optional[BinaryIO] = None) -> Optional[bytes]:
         """Convert EPUB content to PDF.
         
         Args:
-            epub_content: Either bytes or an io.BytesIO object containing EPUB data.
+            epub_content: Either bytes or a seekable binary file-like object
+                (e.g. io.BytesIO or a spooled temporary file) containing EPUB data.
+                File-like objects are handed to ebooklib as-is without copying.
+            output: Optional writable binary file. When given, the PDF is written
+                straight into it and None is returned, avoiding an in-memory copy
+                of the whole document.
+
+        Returns:
+            The PDF as bytes, or None when ``output`` was given.
         """
         try:
             self.logger.info("Starting EPUB to PDF conversion with WeasyPrint")
             
-            # Convert bytes to BytesIO if needed
-            if isinstance(epub_content, bytes):
+            # Convert bytes to BytesIO if needed; file-like objects are read in place
+            if isinstance(epub_content, (bytes, bytearray)):
                 epub_buffer = io.BytesIO(epub_content)
             else:
                 epub_buffer = epub_content
             
             # Read EPUB
             epub_book = epub.read_epub(epub_buffer)
-            logger.info(f"Read EPUB: {epub_book.title}")
+            logger.info("Read EPUB: %s", epub_book.title)
             
+            # Extract CSS from EPUB
+            epub_css = self._extract_all_css(epub_book)
+
             # Build HTML document
             html_content = self._build_html_document(epub_book)
 
-            # Save debug HTML for inspection
-            try:
-                with open('/tmp/debug.html', 'w', encoding='utf-8') as f:
-                    f.write(html_content)
-                logger.info("Debug HTML saved to /tmp/debug.html")
-            except Exception as e:
-                logger.warning(f"Failed to save debug.html: {e}")
+            # Images are now embedded in the HTML, so release the book's chapter and
+            # image payloads before the memory-hungry render instead of after it.
+            # Every item points back at the book; breaking that cycle lets the del
+            # free them now rather than whenever the cyclic GC next runs.
+            for item in epub_book.items:
+                item.book = None
+            del epub_book
+
+            # Save debug HTML for inspection when enabled
+            if settings.write_debug_html:
+                try:
+                    with open(DEBUG_HTML_PATH, 'w', encoding='utf-8') as f:
+                        f.write(html_content)
+                    logger.info("Debug HTML saved to %s", DEBUG_HTML_PATH)
+                except Exception as e:
+                    logger.warning("Failed to save debug.html: %s", e)
             
             # Log first 500 characters for debugging
-            self.logger.debug(f"Generated HTML (first 500 chars):\n{html_content[:500]}")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Generated HTML (first 500 chars):\n%s", html_content[:500])
             
-            # Extract CSS from EPUB
-            epub_css = self._extract_all_css(epub_book)
-            
-            # Add CJK font support if available
-            css_content = CSS_STYLES
+            # Base styles (with CJK font support) come last so they override EPUB CSS if needed
+            stylesheets = [self.base_stylesheet]
             if epub_css:
-                # Prepend EPUB CSS so our base styles override if needed
-                css_content = epub_css + "\n" + css_content
-            
-            if self.cjk_font_path:
-                # Embed the CJK font in CSS
-                font_dir = os.path.dirname(self.cjk_font_path)
-                css_content += f"""
-@font-face {{
-    font-family: "WenQuanYi";
-    src: url('file://{self.cjk_font_path}');
-}}
-"""
-            
-            # Create CSS object
-            css = CSS(string=css_content)
+                stylesheets.insert(0, CSS(string=epub_css))
             
             # Create HTML object and render to PDF with FontConfiguration
-            font_config = FontConfiguration()
             html_doc = HTML(string=html_content)
-            pdf_bytes = html_doc.write_pdf(stylesheets=[css], font_config=font_config)
+            pdf_bytes = html_doc.write_pdf(output, stylesheets=stylesheets, font_config=self._get_font_config())
             
             self.logger.info("EPUB to PDF conversion completed successfully")
             return pdf_bytes
             
         except Exception as e:
-            self.logger.error(f"Conversion failed: {str(e)}")
+            self.logger.error("Conversion failed: %s", e)
             raise ConversionError(f"Failed to convert EPUB to PDF: {str(e)}")
 
     def _build_html_document(self, epub_book: epub.EpubBook) -> str:
@@ -686,162 +1146,200 @@ class EPUBToPDFConverter:
         """
         html_parts = ['<!DOCTYPE html>', '<html><head>', '<meta charset="utf-8">', '<title>']
         
-        # Add title
-        if epub_book.title:
-            title_text = epub_book.title
-            if isinstance(title_text, (tuple, list)):
-                title_text = title_text[0]
-            html_parts.append(escape(str(title_text)[:500]))
+        # Add title; it is escaped once and reused for the heading below
+        title_html = self._title_html(epub_book)
+        if title_html:
+            html_parts.append(title_html)
         
         html_parts.extend(['</title>', '</head>', '<body>'])
         
         # Extract images and bold classes early so we can detect cover
-        epub_images = self._extract_images(epub_book)
+        # Manifest media types keyed by id() of the image bytes, used to label data URIs
+        image_media_types: Dict[int, str] = {}
+        epub_images = self._extract_images(epub_book, image_media_types)
+        image_index = self._build_image_index(epub_images)
+        # Base64 data URIs keyed by id() of the image bytes, so an image referenced
+        # several times is only encoded once per document
+        image_uris: Dict[int, str] = {}
+        # Rendered markup per <img> src, so repeated references skip resolution entirely
+        image_html: Dict[str, str] = {}
         bold_classes = self._extract_bold_classes(epub_book)
+        # The spine is walked once; cover detection and the chapter loop share the result
+        chapters = self._collect_spine_chapters(epub_book)
         
         # Detect and add cover page if available
-        cover_image_data = self._detect_cover_image(epub_book, epub_images)
+        cover_image_data = self._detect_cover_image(epub_book, epub_images, image_index, chapters)
         if cover_image_data:
-            img_b64 = base64.b64encode(cover_image_data).decode('utf-8')
+            img_uri = self._image_data_uri(cover_image_data, image_uris, image_media_types)
             html_parts.append(
-                f'<section class="cover-page"><img src="data:image/png;base64,{img_b64}" alt="Cover" /></section>'
+                f'<section class="cover-page"><img src="{img_uri}" alt="Cover" /></section>'
             )
         
         # Add title as heading
-        if epub_book.title:
-            title_text = epub_book.title
-            if isinstance(title_text, (tuple, list)):
-                title_text = title_text[0]
-            if title_text:
-                html_parts.append(f'<h1>{escape(str(title_text)[:500])}</h1>')
+        if title_html:
+            html_parts.append(f'<h1>{title_html}</h1>')
         
         self.logger.info("Processing chapters...")
-        chapters_processed = 0
-        
-        # Process spine items
-        for item in epub_book.spine:
-            item_id = item[0] if isinstance(item, tuple) else item
 
-            try:
-                # Try to get chapter by ID first
-                chapter = epub_book.get_item_with_id(item_id)
-                
-                # If not found by ID, try to find by filename
-                if chapter is None:
-                    for book_item in epub_book.get_items():
-                        if isinstance(book_item, epub.EpubHtml) and book_item.get_name() == item_id:
-                            chapter = book_item
-                            break
-                
-                if chapter is None or not isinstance(chapter, epub.EpubHtml):
-                    continue
-
-                chapters_processed += 1
-                content = chapter.get_content().decode('utf-8', errors='ignore')
-
-                content = self._strip_non_content_tags(content)
-
-                # Convert CSS classes to HTML tags
-                content = convert_css_classes_to_html(content)
+        # Render every chapter's markup; large chapters of large books are rendered in
+        # worker processes, everything else lazily here as the chapter is written
+        extractor = FormattingPreservingExtractor(bold_classes=bold_classes, _lowercased=True)
+        executor = None
+        if len(chapters) > 1 and sum(len(content) for _, content in chapters) >= PARALLEL_PARSE_MIN_BYTES:
+            executor = _get_parse_executor()
+        rendered = []
+        for _, content in chapters:
+            render = partial(_render_chapter, content, bold_classes, extractor)
+            if executor is not None and len(content) >= PARALLEL_PARSE_MIN_CHAPTER_BYTES:
+                # A chapter whose worker dies is rendered here instead of being dropped
+                try:
+                    future = executor.submit(_render_chapter, content, bold_classes)
+                except BrokenProcessPool:
+                    _discard_parse_executor(executor)
+                    executor = None
+                else:
+                    render = partial(_pooled_result, executor, future, render)
+            rendered.append(render)
+        
+        # Bound once here rather than looked up for every image
+        resolve_image_path = self._resolve_image_path
+        image_data_uri = self._image_data_uri
 
-                extractor = FormattingPreservingExtractor(bold_classes=bold_classes)
-                extractor.feed(content)
-                extractor.close()
+        # Chapters are consumed from a queue so each one's raw HTML and markup
+        # are released as soon as it has been written
+        chapter_queue = deque(zip((item_id for item_id, _ in chapters), rendered))
+        del chapters, rendered
 
-                # Start chapter section for proper pagination
-                html_parts.append('<section class="chapter">')
-                
-                # Process elements
-                for element in extractor.elements:
-                    if not element:
-                        continue
+        # Process spine items
+        skipped_chapters = []
+        while chapter_queue:
+            item_id, render = chapter_queue.popleft()
+            try:
+                chapter_parts, images = render()
+                del render
 
-                    element_type = element[0]
-                    
-                    if element_type == 'img':
-                        img_data = element[1]
-                        src = img_data.get('src', '')
-                        
+                # Fill in the image slots left by the renderer
+                for index, src in images:
+                    img_html = image_html.get(src)
+                    if img_html is None:
                         # Try to resolve image from EPUB
-                        resolved_img = self._resolve_image_path(src, epub_images)
+                        resolved_img = resolve_image_path(src, epub_images, image_index)
                         if resolved_img:
                             # Embed image as base64
-                            img_b64 = base64.b64encode(resolved_img).decode('utf-8')
-                            html_parts.append(f'<img src="data:image/png;base64,{img_b64}" alt="Image" />')
+                            img_uri = image_data_uri(resolved_img, image_uris, image_media_types)
+                            img_html = f'<img src="{img_uri}" alt="Image" />'
                         else:
-                            html_parts.append(f'<p><em>Image: {escape(src)}</em></p>')
-                    
-                    elif element_type in ['h1', 'h2', 'h3']:
-                        text = self._escape_text(element[1])
-                        attrs = element[2] if len(element) > 2 else {}
-                        # Build attributes string
-                        attrs_str = ''
-                        if attrs:
-                            for key, value in attrs.items():
-                                attrs_str += f' {key}="{value}"'
-                        html_parts.append(f'<{element_type}{attrs_str}>{text}</{element_type}>')
-                    
-                    elif element_type == 'center':
-                        text = self._escape_text(element[1])
-                        html_parts.append(f'<div align="center">{text}</div>')
-                    
-                    elif element_type in ['p', 'div', 'li']:
-                        text = self._escape_text(element[1])
-                        attrs = element[2] if len(element) > 2 else {}
-                        # Build attributes string
-                        attrs_str = ''
-                        if attrs:
-                            for key, value in attrs.items():
-                                attrs_str += f' {key}="{value}"'
-                        html_parts.append(f'<{element_type}{attrs_str}>{text}</{element_type}>')
-                
-                # Close chapter section
+                            img_html = f'<p><em>Image: {escape(src)}</em></p>'
+                        image_html[src] = img_html
+                    chapter_parts[index] = img_html
+
+                # The chapter is only added once fully rendered, so a chapter that
+                # fails part-way never leaves a half-written section behind
+                html_parts.append('<section class="chapter">')
+                html_parts.extend(chapter_parts)
                 html_parts.append('</section>')
             
             except Exception as e:
-                self.logger.warning(f"Skipping chapter {item_id}: {str(e)}")
+                # Broken books can fail on every chapter, so details go to DEBUG and
+                # a single summary is logged below
+                self.logger.debug("Skipping chapter %s: %s", item_id, e)
+                skipped_chapters.append(item_id)
                 continue
 
+        if skipped_chapters:
+            self.logger.warning(
+                "Skipped %d chapter(s) that failed to render: %s",
+                len(skipped_chapters), ', '.join(map(str, skipped_chapters)),
+            )
+
         html_parts.extend(['</body>', '</html>'])
         return ''.join(html_parts)
+
+    @staticmethod
+    def _title_html(epub_book: epub.EpubBook) -> str:
+        """Return the book title, truncated to 500 characters and HTML-escaped."""
+        title_text = epub_book.title
+        if isinstance(title_text, (tuple, list)):
+            title_text = title_text[0] if title_text else ''
+        if not title_text:
+            return ''
+        return escape(str(title_text)[:500])
+
+    def _collect_spine_chapters(self, epub_book: epub.EpubBook) -> List[Tuple[str, bytes]]:
+        """Return ``(item_id, raw_html)`` for each HTML chapter in spine order."""
+        chapters = []
+        # get_item_with_id() scans the whole manifest, so spine entries are resolved
+        # through indexes built in one pass: items by ID, and HTML items by file name
+        items_by_id = {}
+        chapters_by_name = {}
+        for book_item in epub_book.get_items():
+            items_by_id.setdefault(book_item.id, book_item)
+            if isinstance(book_item, epub.EpubHtml):
+                chapters_by_name.setdefault(book_item.get_name(), book_item)
+
+        unreadable_chapters = []
+        for item in epub_book.spine:
+            item_id = item[0] if isinstance(item, tuple) else item
+
+            try:
+                # Try to get chapter by ID first, then by filename
+                chapter = items_by_id.get(item_id)
+                if chapter is None:
+                    chapter = chapters_by_name.get(item_id)
+                
+                if chapter is None or not isinstance(chapter, epub.EpubHtml):
+                    continue
+
+                chapters.append((item_id, chapter.get_content()))
+            except Exception as e:
+                # Details go to DEBUG; one summary for the whole spine is logged below
+                self.logger.debug("Skipping chapter %s: %s", item_id, e)
+                unreadable_chapters.append(item_id)
+
+        if unreadable_chapters:
+            self.logger.warning(
+                "Skipped %d chapter(s) that could not be read: %s",
+                len(unreadable_chapters), ', '.join(map(str, unreadable_chapters)),
+            )
+        return chapters
     
-    def _escape_text(self, text: str) -> str:
-        """Escape text while preserving formatting tags.
-        
-        This method escapes HTML special characters but preserves allowed formatting tags
-        like <b>, <strong>, <i>, <em>, <u>, <font>, and <br>.
+    @staticmethod
+    def _image_data_uri(
+        img_data: bytes,
+        cache: Dict[int, str],
+        media_types: Optional[Dict[int, str]] = None,
+    ) -> str:
+        """Return a base64 data URI for image bytes, reusing earlier encodings.
+
+        The manifest media type from ``media_types`` is used when it names an
+        image type; otherwise the type is sniffed from the bytes. Every
+        reference to the same image gets the identical URI string, so
+        WeasyPrint loads and decodes it once per document.
         """
-        # First, escape all text
-        escaped = escape(text)
-        
-        # Then, unescape allowed tags and characters
-        # Pattern to match allowed inline formatting tags
-        escaped = escaped.replace('&lt;b&gt;', '<b>')
-        escaped = escaped.replace('&lt;/b&gt;', '</b>')
-        escaped = escaped.replace('&lt;strong&gt;', '<strong>')
-        escaped = escaped.replace('&lt;/strong&gt;', '</strong>')
-        escaped = escaped.replace('&lt;i&gt;', '<i>')
-        escaped = escaped.replace('&lt;/i&gt;', '</i>')
-        escaped = escaped.replace('&lt;em&gt;', '<em>')
-        escaped = escaped.replace('&lt;/em&gt;', '</em>')
-        escaped = escaped.replace('&lt;u&gt;', '<u>')
-        escaped = escaped.replace('&lt;/u&gt;', '</u>')
-        escaped = escaped.replace('&lt;br&gt;', '<br>')
-        escaped = escaped.replace('&lt;br/&gt;', '<br/>')
-        escaped = escaped.replace('&lt;br /&gt;', '<br />')
-        
-        # Handle font tags with color attributes - convert to span with style
-        escaped = re.sub(
-            r'&lt;font color=&quot;([^&]*?)&quot;&gt;',
-            r'<span style="color: \1;">',
-            escaped
-        )
-        escaped = escaped.replace('&lt;/font&gt;', '</span>')
-        
-        return escaped
-
-    def _detect_cover_image(self, book: epub.EpubBook, epub_images: Dict[str, bytes]) -> Optional[bytes]:
+        key = id(img_data)
+        uri = cache.get(key)
+        if uri is None:
+            mime_type = media_types.get(key) if media_types else None
+            if not mime_type or not mime_type.startswith('image/'):
+                mime_type = _sniff_image_mime_type(img_data)
+            img_b64 = base64.b64encode(img_data).decode('ascii')
+            uri = cache[key] = f'data:{mime_type};base64,{img_b64}'
+        return uri
+
+    # Pure function of its input; exposed as a staticmethod so hot loops call it without a wrapper
+    _escape_text = staticmethod(escape_formatted_text)
+
+    def _detect_cover_image(
+        self,
+        book: epub.EpubBook,
+        epub_images: Dict[str, bytes],
+        image_index: Optional[Dict[str, bytes]] = None,
+        chapters: Optional[List[Tuple[str, bytes]]] = None,
+    ) -> Optional[bytes]:
         """Detect cover image from EPUB metadata or first image-only chapter.
+
+        ``chapters`` is the output of _collect_spine_chapters(); it is collected
+        here when not supplied.
         
         Returns:
             Image bytes if found, None otherwise.
@@ -865,132 +1363,162 @@ class EPUBToPDFConverter:
                 except (AttributeError, KeyError):
                     pass
             
-            # Try to get cover by common names
-            for item in book.get_items():
-                if isinstance(item, epub.EpubImage):
-                    name = item.get_name().lower()
-                    if 'cover' in name:
-                        return item.get_content()
+            # Try to get cover by common names, using the images already extracted
+            # instead of walking and type-checking every manifest item again
+            for name, img_data in epub_images.items():
+                if 'cover' in name.lower():
+                    return img_data
         except Exception:
             pass
         
         # Try to detect from first image-only chapter
         try:
-            for item in book.spine:
-                item_id = item[0] if isinstance(item, tuple) else item
-                chapter = book.get_item_with_id(item_id)
-                
-                if chapter is None:
-                    for book_item in book.get_items():
-                        if isinstance(book_item, epub.EpubHtml) and book_item.get_name() == item_id:
-                            chapter = book_item
-                            break
-                
-                if chapter and isinstance(chapter, epub.EpubHtml):
-                    content = chapter.get_content().decode('utf-8', errors='ignore')
-                    # Check if this is an image-only chapter
-                    if '<img' in content.lower() and len(content) < 1000:
-                        # Try to extract image
-                        img_match = re.search(r'<img[^>]+src=["\']([^"\']+)["\']', content, re.IGNORECASE)
-                        if img_match:
-                            src = img_match.group(1)
-                            img_data = self._resolve_image_path(src, epub_images)
-                            if img_data:
-                                return img_data
+            if chapters is None:
+                chapters = self._collect_spine_chapters(book)
+            for _, raw_content in chapters:
+                # UTF-8 uses at most 4 bytes per character, so longer chapters can
+                # never be short enough and are not worth decoding
+                if len(raw_content) >= COVER_CHAPTER_MAX_CHARS * 4:
+                    continue
+                content = raw_content.decode('utf-8', errors='ignore')
+                # Check if this is an image-only chapter; the pattern search finds
+                # any <img> itself, without lowercasing a copy of the chapter first
+                if len(content) < COVER_CHAPTER_MAX_CHARS:
+                    img_match = IMG_SRC_PATTERN.search(content)
+                    if img_match:
+                        src = img_match.group(1)
+                        img_data = self._resolve_image_path(src, epub_images, image_index)
+                        if img_data:
+                            return img_data
         except Exception:
             pass
         
         return None
     
-    def _extract_images(self, book: epub.EpubBook) -> Dict[str, bytes]:
-        """Extract all images from EPUB."""
+    def _extract_images(
+        self,
+        book: epub.EpubBook,
+        media_types: Optional[Dict[int, str]] = None,
+    ) -> Dict[str, bytes]:
+        """Extract all images from EPUB.
+
+        When ``media_types`` is given, each image's manifest media type is
+        recorded in it, keyed by id() of the image bytes.
+        """
         images = {}
         
         for item in book.get_items():
             try:
-                item_type = item.get_type()
-                is_image = False
+                if self._is_image_item(item):
+                    content = images[item.get_name()] = item.get_content()
+                    media_type = getattr(item, 'media_type', None)
+                    if media_types is not None and isinstance(media_type, str):
+                        media_types[id(content)] = media_type.lower()
+            except Exception:
+                continue
 
-                # Check if it's an image based on type or content
-                try:
-                    if hasattr(ebooklib, 'ITEM_IMAGE') and item_type == ebooklib.ITEM_IMAGE:
-                        is_image = True
-                except (AttributeError, TypeError):
-                    pass
+        return images
 
-                if not is_image and isinstance(item_type, str):
-                    is_image = 'image' in item_type.lower()
+    @staticmethod
+    def _is_image_item(item) -> bool:
+        """Check whether an EPUB item is an image, without touching its content."""
+        # Fast path: manifest media types are almost always present and lowercase
+        media_type = getattr(item, 'media_type', '')
+        if isinstance(media_type, str) and media_type.startswith('image/'):
+            return True
 
-                if not is_image:
-                    media_type = getattr(item, 'media_type', '')
-                    if isinstance(media_type, str):
-                        is_image = 'image' in media_type.lower()
+        item_type = item.get_type()
+        if item_type == ebooklib.ITEM_IMAGE:
+            return True
+        if isinstance(item_type, str) and 'image' in item_type.lower():
+            return True
 
-                if is_image:
-                    name = item.get_name()
-                    images[name] = item.get_content()
-            except Exception:
-                continue
+        return isinstance(media_type, str) and 'image' in media_type.lower()
 
-        return images
+    @staticmethod
+    def _is_css_item(item) -> bool:
+        """Check whether an EPUB item is a stylesheet, without touching its content."""
+        # Fast path: get_type() guesses from the file extension by walking ebooklib's table
+        media_type = getattr(item, 'media_type', '')
+        if isinstance(media_type, str) and media_type.startswith('text/css'):
+            return True
+
+        if item.get_type() == ebooklib.ITEM_STYLE:
+            return True
 
-    def _resolve_image_path(self, src: str, epub_images: Dict[str, bytes]) -> Optional[bytes]:
-        """Resolve image source to content."""
+        return isinstance(media_type, str) and media_type.lower().startswith('text/css')
+
+    @staticmethod
+    def _build_image_index(epub_images: Dict[str, bytes]) -> Dict[str, bytes]:
+        """Index EPUB images by every trailing path suffix of their names.
+
+        ``OEBPS/images/a.png`` is reachable as ``OEBPS/images/a.png``,
+        ``images/a.png`` and ``a.png``, and each of those lowercased. Full
+        names take priority over suffixes, exact case over lowercase, and
+        among equal suffixes the first image wins.
+        """
+        index = dict(epub_images)
+        for name, data in epub_images.items():
+            parts = name.split('/')
+            for i in range(1, len(parts)):
+                index.setdefault('/'.join(parts[i:]), data)
+        for key, data in list(index.items()):
+            index.setdefault(key.lower(), data)
+        return index
+
+    def _resolve_image_path(
+        self,
+        src: str,
+        epub_images: Dict[str, bytes],
+        image_index: Optional[Dict[str, bytes]] = None,
+    ) -> Optional[bytes]:
+        """Resolve image source to content.
+
+        ``image_index`` is the suffix index from ``_build_image_index``. Callers
+        resolving many sources should build it once and pass it in; otherwise
+        it is built for this call.
+        """
         if not src:
             return None
             
         # Try direct match first
         if src in epub_images:
             return epub_images[src]
-            
-        # Try with different path components
+
+        if image_index is None:
+            image_index = self._build_image_index(epub_images)
+
         src_parts = src.split('/')
+        # Every indexed image is reachable by its filename, so a filename miss
+        # means no longer suffix can match either; sources whose case differs
+        # from the manifest fall back to the lowercased keys
+        if src_parts[-1] not in image_index:
+            src_parts = src.lower().split('/')
+            if src_parts[-1] not in image_index:
+                return None
+        # Longest matching path suffix wins, down to the bare filename
         for i in range(len(src_parts)):
-            candidate = '/'.join(src_parts[i:])
-            if candidate in epub_images:
-                return epub_images[candidate]
-                
-        # Try just the filename
-        filename = src_parts[-1]
-        for img_name in epub_images:
-            if img_name.endswith(filename):
-                return epub_images[img_name]
-        
+            img_data = image_index.get('/'.join(src_parts[i:]))
+            if img_data is not None:
+                return img_data
         return None
 
-    @staticmethod
-    def _strip_non_content_tags(html: str) -> str:
-        """Remove script and style tags from HTML."""
-        if not html:
-            return ''
-        html = re.sub(r'(?is)<style[^>]*>.*?</style>', '', html)
-        html = re.sub(r'(?is)<script[^>]*>.*?</script>', '', html)
-        return html
-
-    def _extract_bold_classes(self, book: epub.EpubBook) -> set[str]:
-        """Extract CSS class names that imply bold text."""
+    def _extract_bold_classes(self, book: epub.EpubBook) -> frozenset[str]:
+        """Extract CSS class names that imply bold text, lowercased."""
         bold_classes = set()
 
         for item in book.get_items():
             try:
-                item_type = item.get_type()
-                media_type = getattr(item, 'media_type', '')
-
-                is_css = item_type == ebooklib.ITEM_STYLE
-                if not is_css and isinstance(media_type, str):
-                    is_css = media_type.lower().startswith('text/css')
-
-                if is_css:
+                if self._is_css_item(item):
                     css = item.get_content().decode('utf-8', errors='ignore')
                     bold_classes.update(extract_bold_classes_from_css(css))
                 elif isinstance(item, epub.EpubHtml):
-                    html = item.get_content().decode('utf-8', errors='ignore')
-                    for css in re.findall(r'(?is)<style[^>]*>(.*?)</style>', html):
+                    for css in _iter_style_blocks(item.get_content()):
                         bold_classes.update(extract_bold_classes_from_css(css))
             except Exception:
                 continue
 
-        return bold_classes
+        return frozenset(c.lower() for c in bold_classes)
 
     def _extract_all_css(self, book: epub.EpubBook) -> str:
         """Extract all CSS from EPUB book files.
@@ -1002,15 +1530,8 @@ class EPUBToPDFConverter:
         
         for item in book.get_items():
             try:
-                item_type = item.get_type()
-                media_type = getattr(item, 'media_type', '')
-                
                 # Check if it's a CSS file
-                is_css = item_type == ebooklib.ITEM_STYLE
-                if not is_css and isinstance(media_type, str):
-                    is_css = media_type.lower().startswith('text/css')
-                
-                if is_css:
+                if self._is_css_item(item):
                     try:
                         css = item.get_content().decode('utf-8', errors='ignore')
                         if css.strip():
@@ -1020,10 +1541,8 @@ class EPUBToPDFConverter:
                 elif isinstance(item, epub.EpubHtml):
                     # Extract inline style tags from HTML chapters
                     try:
-                        html = item.get_content().decode('utf-8', errors='ignore')
                         # Find all <style> tags and extract their content
-                        style_blocks = re.findall(r'(?is)<style[^>]*>(.*?)</style>', html)
-                        for style_block in style_blocks:
+                        for style_block in _iter_style_blocks(item.get_content()):
                             if style_block.strip():
                                 css_parts.append(style_block)
                     except (AttributeError, ValueError):
@@ -1036,7 +1555,6 @@ class EPUBToPDFConverter:
         
         # Clean up unnecessary parts and warnings
         # Remove @import and @namespace that might cause issues
-        combined_css = re.sub(r'@import\s+[^;]+;', '', combined_css)
-        combined_css = re.sub(r'@namespace\s+[^;]+;', '', combined_css)
+        combined_css = CSS_IMPORT_NAMESPACE_PATTERN.sub('', combined_css)
         
         return combined_css if combined_css.strip() else ""
@@ -4,6 +4,7 @@ from fastapi.testclient import TestClient
 from ebooklib import epub
 from app.main import app
 from app.core.config import settings
+from app.api.routes import get_disposition_header
 
 
 @pytest.fixture
@@ -162,6 +163,15 @@ class TestConvertEndpoint:
         assert response.status_code == 200
         assert "my_book.pdf" in response.headers.get("content-disposition", "")
 
+    def test_disposition_header_encodes_utf8_filename(self):
+        """Test RFC 5987 percent-encoding of non-ASCII filenames."""
+        disposition = get_disposition_header("测试 book~v1.epub")
+
+        assert 'filename="output.pdf"' in disposition
+        assert disposition.endswith(
+            "filename*=UTF-8''%E6%B5%8B%E8%AF%95%20book~v1.pdf"
+        )
+
     def test_convert_pdf_size_reasonable(self, client):
         """Test that generated PDF has reasonable size."""
         epub_content = create_test_epub()
@@ -96,6 +96,85 @@ def test_complex_centered_content():
     assert len(centered_elements) == 2  # 明确期望找到2个
 
 
+def test_parse_matches_feed():
+    """测试 lxml 解析路径与 HTMLParser 路径输出一致"""
+    from app.services.converter import FormattingPreservingExtractor
+
+    html_content = """<?xml version="1.0" encoding="utf-8"?>
+    <html xmlns="http://www.w3.org/1999/xhtml"><head><title>标题</title></head><body>
+    <h1 style="text-align: center;">居中标题</h1>
+    <p>正常<br/>文本 &amp; <b>粗体</b>&nbsp;<span style="color: red;">红色</span></p>
+    <img src="images/pic.png"/>
+    <center>居中文本</center>
+    </body></html>
+    """
+
+    extractor = FormattingPreservingExtractor()
+    extractor.feed(html_content)
+    extractor.close()
+
+    assert FormattingPreservingExtractor.parse(html_content).elements == extractor.elements
+
+
+def test_extractor_reuse_across_documents():
+    """测试同一个提取器实例可以连续处理多个章节"""
+    from app.services.converter import FormattingPreservingExtractor
+
+    extractor = FormattingPreservingExtractor()
+    first = extractor.parse_html("<p>第一章 <b>未闭合")
+    second = extractor.parse_html("<center>第二章</center>")
+
+    assert first == [('p', '第一章 <b>未闭合</b>', {})]
+    assert second == [('center', '第二章', {})]
+
+
+def test_parse_html_accepts_utf8_bytes():
+    """测试直接传入 UTF-8 字节与传入字符串结果一致"""
+    from app.services.converter import FormattingPreservingExtractor
+
+    html_content = '<p>中文 <b>粗体</b> &amp; café</p>'
+    extractor = FormattingPreservingExtractor()
+
+    assert extractor.parse_html(html_content.encode('utf-8')) == extractor.parse_html(html_content)
+
+
+def test_parse_html_drops_invalid_utf8_like_class_conversion():
+    """测试无效 UTF-8 字节在两条解析路径上都被丢弃，而不是变成替换字符"""
+    from app.services.converter import _parse_chapter
+
+    assert _parse_chapter(b'<p>\xe4\xb8\xad\xff\xe6\x96\x87</p>', frozenset()) == [('p', '中文', {})]
+    assert _parse_chapter(b'<p class="bold">\xe4\xb8\xad\xff\xe6\x96\x87</p>', frozenset()) == [
+        ('p', '<b>中文</b>', {})
+    ]
+
+
+def test_extractor_skips_script_and_style():
+    """测试 script/style 内容不会进入正文"""
+    from app.services.converter import FormattingPreservingExtractor
+
+    html_content = (
+        '<head><style type="text/css">p { color: red; }</style>'
+        '<script src="a.js"/></head>'
+        '<body><p>正文</p><script>var x = "<b>no</b>";</script></body>'
+    )
+
+    extractor = FormattingPreservingExtractor()
+    extractor.feed(html_content)
+    extractor.close()
+
+    assert extractor.elements == [('p', '正文', {})]
+    assert FormattingPreservingExtractor.parse(html_content).elements == extractor.elements
+
+
+def test_extractor_collapses_whitespace_across_text_chunks():
+    """测试跨文本片段的空白（含 &nbsp;）只折叠为一个空格"""
+    from app.services.converter import FormattingPreservingExtractor
+
+    elements = FormattingPreservingExtractor.parse("<p>甲 \n&nbsp;\t<i>乙</i>\n\n  丙</p>").elements
+
+    assert elements == [('p', '甲 <i>乙</i> 丙', {})]
+
+
 # EPUB居中功能测试已完成
 # 通过手动验证确认居中功能正确工作：
 # - 支持<center>标签
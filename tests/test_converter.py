@@ -1,5 +1,8 @@
 import io
-from typing import Optional
+import tempfile
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
 
 import pytest
 from ebooklib import epub
@@ -54,6 +57,43 @@ def _build_epub_with_html(html: str, css: Optional[str] = None) -> bytes:
     return epub_buffer.getvalue()
 
 
+def _build_epub_with_chapters(chapter_htmls: List[str]) -> bytes:
+    book = epub.EpubBook()
+    book.set_identifier("chapters_test")
+    book.set_title("Chapters Book")
+
+    chapters = []
+    for i, html in enumerate(chapter_htmls, 1):
+        chapter = epub.EpubHtml(title=f"Chapter {i}", file_name=f"chapter{i}.xhtml", lang="en")
+        chapter.content = html
+        book.add_item(chapter)
+        chapters.append(chapter)
+
+    book.spine = chapters
+    book.add_item(epub.EpubNcx())
+
+    epub_buffer = io.BytesIO()
+    epub.write_epub(epub_buffer, book, {})
+    return epub_buffer.getvalue()
+
+
+class _BrokenParseExecutor:
+    """Stands in for a process pool whose workers have died."""
+
+    def __init__(self, fail_on_submit: bool):
+        self.fail_on_submit = fail_on_submit
+
+    def submit(self, fn, *args):
+        if self.fail_on_submit:
+            raise BrokenProcessPool("worker died")
+        future = Future()
+        future.set_exception(BrokenProcessPool("worker died"))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
 class TestEPUBToPDFConverter:
     def test_convert_valid_epub(self, converter):
         """Test conversion of a valid EPUB file."""
@@ -88,6 +128,56 @@ class TestEPUBToPDFConverter:
         # Basic PDF header check
         assert pdf_content.startswith(b"%PDF")
 
+    def test_convert_accepts_file_object(self, converter):
+        """Test conversion straight from a seekable file object."""
+        epub_content = _build_epub_with_html("<p>Spooled content</p>")
+
+        with tempfile.SpooledTemporaryFile() as spool:
+            spool.write(epub_content)
+            spool.seek(0)
+            pdf_content = converter.convert(spool)
+
+        assert pdf_content.startswith(b"%PDF")
+
+    def test_convert_writes_to_output_file(self, converter):
+        """Test conversion straight into a caller-supplied output file."""
+        epub_content = _build_epub_with_html("<p>Streamed content</p>")
+        output = io.BytesIO()
+
+        assert converter.convert(epub_content, output) is None
+        assert output.getvalue().startswith(b"%PDF")
+
+    def test_convert_releases_book_before_rendering(self, converter, monkeypatch):
+        """The parsed book is freed before the PDF render starts, without waiting for the cyclic GC."""
+        import gc
+        import weakref
+
+        from app.services import converter as converter_module
+
+        book_refs = []
+        build_html_document = converter._build_html_document
+
+        def capture_book(epub_book):
+            book_refs.append(weakref.ref(epub_book))
+            return build_html_document(epub_book)
+
+        class RecordingHTML:
+            def __init__(self, string):
+                self.book_alive_at_render = book_refs[0]() is not None
+
+            def write_pdf(self, output=None, **kwargs):
+                assert not self.book_alive_at_render
+                return b"%PDF-stub"
+
+        monkeypatch.setattr(converter, "_build_html_document", capture_book)
+        monkeypatch.setattr(converter_module, "HTML", RecordingHTML)
+
+        gc.disable()
+        try:
+            assert converter.convert(_build_epub_with_html("<p>Released</p>")) == b"%PDF-stub"
+        finally:
+            gc.enable()
+
     def test_convert_invalid_epub(self, converter):
         """Test conversion of invalid EPUB content."""
         with pytest.raises(ConversionError):
@@ -119,6 +209,84 @@ class TestEPUBToPDFConverter:
         assert "Text with" in escaped
         assert "characters" in escaped
 
+    def test_escape_text_plain_text_unchanged(self, converter):
+        """Text without special characters is returned as-is."""
+        text = "纯文本段落 with no markup"
+        assert converter._escape_text(text) is text
+
+    def test_escape_text_matches_html_escape(self, converter):
+        """Special characters are escaped like html.escape while formatting tags survive."""
+        text = 'a & b < c > "d" \'e\' <b>bold</b> <font color="#ff0000">red</font>'
+        assert converter._escape_text(text) == (
+            'a &amp; b &lt; c &gt; &quot;d&quot; &#x27;e&#x27; <b>bold</b> '
+            '<span style="color: #ff0000;">red</span>'
+        )
+
+    def test_resolve_image_path_by_basename(self, converter):
+        """Image sources with unrelated directories resolve through the basename index."""
+        epub_images = {"OEBPS/images/pic.png": b"png-bytes", "OEBPS/images/other.jpg": b"jpg-bytes"}
+        image_index = converter._build_image_index(epub_images)
+
+        assert converter._resolve_image_path("../img/pic.png", epub_images, image_index) == b"png-bytes"
+        assert converter._resolve_image_path("images/other.jpg", epub_images, image_index) == b"jpg-bytes"
+        assert converter._resolve_image_path("missing.png", epub_images, image_index) is None
+
+    def test_resolve_image_path_prefers_longest_suffix(self, converter):
+        """Images sharing a filename are told apart by their directories."""
+        epub_images = {"OEBPS/a/pic.png": b"a-bytes", "OEBPS/b/pic.png": b"b-bytes"}
+        image_index = converter._build_image_index(epub_images)
+
+        assert converter._resolve_image_path("../b/pic.png", epub_images, image_index) == b"b-bytes"
+        assert converter._resolve_image_path("pic.png", epub_images, image_index) == b"a-bytes"
+
+    def test_resolve_image_path_ignores_case_on_miss(self, converter):
+        """Sources whose case differs from the manifest name still resolve, exact case first."""
+        epub_images = {"OEBPS/Images/Pic.PNG": b"upper-bytes", "OEBPS/images/pic.png": b"lower-bytes"}
+        image_index = converter._build_image_index(epub_images)
+
+        assert converter._resolve_image_path("../Images/Pic.PNG", epub_images, image_index) == b"upper-bytes"
+        assert converter._resolve_image_path("../images/pic.png", epub_images, image_index) == b"lower-bytes"
+        assert converter._resolve_image_path("../IMAGES/PIC.png", epub_images, image_index) == b"lower-bytes"
+
+    def test_resolve_image_path_without_index(self, converter):
+        """Without a prebuilt index the same suffix rules apply."""
+        epub_images = {"OEBPS/images/pic.png": b"png-bytes"}
+
+        assert converter._resolve_image_path("../images/pic.png", epub_images) == b"png-bytes"
+        assert converter._resolve_image_path("missing.png", epub_images) is None
+
+    def test_image_data_uri_uses_sniffed_mime_type(self, converter):
+        """Embedded images are labelled by content and encoded once per document."""
+        jpeg = b"\xff\xd8\xff\xe0fake-jpeg"
+        svg = b'<?xml version="1.0"?><svg xmlns="http://www.w3.org/2000/svg"></svg>'
+        cache = {}
+
+        jpeg_uri = converter._image_data_uri(jpeg, cache)
+        assert jpeg_uri.startswith("data:image/jpeg;base64,")
+        assert converter._image_data_uri(jpeg, cache) is jpeg_uri
+        assert converter._image_data_uri(svg, cache).startswith("data:image/svg+xml;base64,")
+
+    def test_image_data_uri_prefers_manifest_media_type(self, converter):
+        """Manifest media types label data URIs; generic or missing ones fall back to sniffing."""
+        bmp = b"BMfake-bitmap"
+        jpeg = b"\xff\xd8\xff\xe0fake-jpeg"
+        media_types = {id(bmp): "image/bmp", id(jpeg): "application/octet-stream"}
+        cache = {}
+
+        assert converter._image_data_uri(bmp, cache, media_types).startswith("data:image/bmp;base64,")
+        assert converter._image_data_uri(jpeg, cache, media_types).startswith("data:image/jpeg;base64,")
+
+    def test_extract_images_records_manifest_media_types(self, converter):
+        """Image extraction keeps each manifest media type, keyed by the image bytes."""
+        book = epub.EpubBook()
+        image = epub.EpubItem(uid="pic", file_name="images/pic.bmp", media_type="image/BMP", content=b"BMfake")
+        book.add_item(image)
+        media_types = {}
+
+        images = converter._extract_images(book, media_types)
+
+        assert media_types == {id(images["images/pic.bmp"]): "image/bmp"}
+
     def test_converter_handles_unicode(self, converter):
         """Test converter handles Unicode characters properly."""
         # Create EPUB with Unicode content
@@ -173,6 +341,123 @@ class TestEPUBToPDFConverter:
         assert len(pdf_content) > 0
         assert pdf_content.startswith(b"%PDF")
 
+    def test_parallel_chapter_parsing_matches_serial(self, converter, monkeypatch):
+        """Chapters parsed in the process pool produce the same document as serial parsing."""
+        from app.services import converter as converter_module
+
+        epub_book = epub.read_epub(io.BytesIO(_build_epub_with_chapters([
+            f'<h1>Chapter {i}</h1><p class="bold">Content {i}</p><p>测试 {i}</p>' for i in range(1, 4)
+        ])))
+
+        serial_html = converter._build_html_document(epub_book)
+        monkeypatch.setattr(converter_module, "PARALLEL_PARSE_MIN_BYTES", 0)
+        monkeypatch.setattr(converter_module, "PARALLEL_PARSE_MIN_CHAPTER_BYTES", 0)
+        parallel_html = converter._build_html_document(epub_book)
+
+        assert "Content 3" in serial_html
+        assert parallel_html == serial_html
+
+        converter_module.shutdown_parse_executor()
+        assert converter_module._parse_executor is None
+
+    @pytest.mark.parametrize("fail_on_submit", [True, False])
+    def test_broken_parse_pool_keeps_every_chapter(self, converter, monkeypatch, fail_on_submit):
+        """Chapters are rendered in-process when the pool breaks, and the broken pool is dropped."""
+        from app.services import converter as converter_module
+
+        epub_book = epub.read_epub(io.BytesIO(_build_epub_with_chapters([
+            f"<h1>Chapter {i}</h1><p>Content {i}</p>" for i in range(1, 4)
+        ])))
+
+        serial_html = converter._build_html_document(epub_book)
+        monkeypatch.setattr(converter_module, "PARALLEL_PARSE_MIN_BYTES", 0)
+        monkeypatch.setattr(converter_module, "PARALLEL_PARSE_MIN_CHAPTER_BYTES", 0)
+        monkeypatch.setattr(converter_module, "_parse_executor", _BrokenParseExecutor(fail_on_submit))
+
+        assert converter._build_html_document(epub_book) == serial_html
+        assert converter_module._parse_executor is None
+
+    def test_parse_executor_created_once_across_threads(self, monkeypatch):
+        """Threads reaching their first large book together share one pool of the capped default size."""
+        import threading
+
+        from app.services import converter as converter_module
+
+        monkeypatch.setattr(converter_module.settings, "parse_workers", 0)
+        monkeypatch.setattr(converter_module, "DEFAULT_PARSE_WORKERS_MAX", 2)
+        barrier = threading.Barrier(8)
+        executors = []
+
+        def get_executor():
+            barrier.wait()
+            executors.append(converter_module._get_parse_executor())
+
+        converter_module.shutdown_parse_executor()
+        threads = [threading.Thread(target=get_executor) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        try:
+            assert all(executor is executors[0] for executor in executors)
+            assert executors[0]._max_workers <= 2
+        finally:
+            converter_module.shutdown_parse_executor()
+
+    def test_negative_parse_workers_rejected_at_startup(self):
+        """A negative PARSE_WORKERS fails when settings load, not on the first large book."""
+        from pydantic import ValidationError
+
+        from app.core.config import Settings
+
+        with pytest.raises(ValidationError):
+            Settings(parse_workers=-1)
+
+    def test_worker_extractor_reused_per_bold_classes(self):
+        """Worker-side parsing reuses one extractor for a book's lowercased bold classes."""
+        from app.services import converter as converter_module
+
+        bold_classes = frozenset({"emph"})
+        first = converter_module._parse_chapter(b'<p class="Emph">A</p>', bold_classes)
+        second = converter_module._parse_chapter(b"<p>B</p>", bold_classes)
+
+        assert first == [("p", "<b>A</b>", {"class": "Emph"})]
+        assert second == [("p", "B", {})]
+        assert converter_module._get_worker_extractor(bold_classes).bold_classes is bold_classes
+
+    def test_extractor_lowercases_frozenset_bold_classes(self):
+        """Bold classes passed as a mixed-case frozenset still match case-insensitively."""
+        from app.services.converter import FormattingPreservingExtractor
+
+        extractor = FormattingPreservingExtractor.parse('<p class="emph">A</p>', frozenset({"Emph"}))
+
+        assert extractor.elements == [("p", "<b>A</b>", {"class": "emph"})]
+
+    def test_render_chapter_leaves_image_slots(self):
+        """Chapters render to markup in one call, with images left for the caller to resolve."""
+        from app.services import converter as converter_module
+
+        parts, images = converter_module._render_chapter(
+            b'<p id="a">A &amp; B</p><img src="x.png"/><p>C</p>', frozenset()
+        )
+
+        assert parts == ['<p id="a">A &amp; B</p>', '', '<p>C</p>']
+        assert images == [(1, "x.png")]
+
+    def test_block_attributes_are_escaped(self, converter):
+        """Attribute values are escaped, and repeated attribute sets render identically."""
+        html = (
+            '<p style=\'font-family: "Song"\'>一</p>'
+            '<p style=\'font-family: "Song"\'>二</p>'
+        )
+        epub_book = epub.read_epub(io.BytesIO(_build_epub_with_html(html)))
+
+        document = converter._build_html_document(epub_book)
+
+        assert '<p style="font-family: &quot;Song&quot;">一</p>' in document
+        assert '<p style="font-family: &quot;Song&quot;">二</p>' in document
+
     def test_bold_text_from_b_tag_uses_bold_font(self, converter):
         epub_content = _build_epub_with_html('<p>Normal <b>Bold</b> text</p>')
         pdf_content = converter.convert(epub_content)
@@ -12,6 +12,7 @@ from ebooklib import epub
 from app.services.converter import (
     EPUBToPDFConverter,
     convert_css_classes_to_html,
+    extract_bold_classes_from_css,
     _is_bold_class,
     _is_center_class,
 )
@@ -72,6 +73,17 @@ class TestCSSClassDetection:
         assert not _is_center_class('normal')
         assert not _is_center_class('')
 
+    def test_extract_bold_classes_from_css(self):
+        """Test that bold rules yield the classes of each selector's subject."""
+        css = (
+            ".chapter .lead, p.note { font-weight: bold } "
+            "@media print { .heavy { font: bold 12px serif } } "
+            ".w7 { font-weight: 700 !important } "
+            ".light { font-weight: normal } "
+            "/* .commented { font-weight: bold } */"
+        )
+        assert extract_bold_classes_from_css(css) == {'lead', 'note', 'heavy', 'w7'}
+
 
 class TestCSSClassConversion:
     """Test conversion of CSS classes to HTML tags."""
@@ -129,6 +141,11 @@ class TestCSSClassConversion:
         assert 'class="x1"' in result
         assert '<b>' not in result
 
+    def test_content_without_bold_or_center_classes_is_returned_as_is(self):
+        """Test that chapters with no bold or center class skip the rewrite entirely."""
+        html = '<p class="x1">Text <b><b>kept</b></b></p><center>c</center>'
+        assert convert_css_classes_to_html(html) is html
+
     def test_mixed_content_with_bold_and_center(self):
         """Test mixed content with both bold and center formatting."""
         html = '<div><span class="bold">Bold</span> and <p class="center">Centered</p></div>'
@@ -136,6 +153,15 @@ class TestCSSClassConversion:
         assert '<b>Bold</b>' in result
         assert 'align="center"' in result
 
+    def test_bold_and_center_classes_in_one_tag(self):
+        """Test that a tag with both bold and center classes gets both conversions."""
+        html = '<p class="bold center">Title</p><div class="fw-bold"><p class="text-center">Body</p></div>'
+        result = convert_css_classes_to_html(html)
+        assert result == (
+            '<p class="center" align="center" style="text-align: center;"><b>Title</b></p>'
+            '<div><b><p class="text-center" align="center" style="text-align: center;">Body</p></b></div>'
+        )
+
     def test_nested_tags_with_bold_class(self):
         """Test nested tags with bold class."""
         html = '<p><span class="bold">Bold <i>italic</i> text</span></p>'
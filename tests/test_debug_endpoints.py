@@ -4,6 +4,7 @@ import pytest
 from fastapi.testclient import TestClient
 from ebooklib import epub
 from app.main import app
+from app.core.config import settings
 
 
 @pytest.fixture
@@ -12,6 +13,12 @@ def client():
     return TestClient(app)
 
 
+@pytest.fixture(autouse=True)
+def write_debug_html(monkeypatch):
+    """Enable debug HTML output for these tests."""
+    monkeypatch.setattr(settings, "write_debug_html", True)
+
+
 def create_test_epub() -> bytes:
     """
     Create a minimal valid EPUB file for testing.
@@ -218,3 +225,19 @@ class TestDebugEndpoints:
         assert response2.json()["file_exists"] is True
         # Sizes will likely differ due to different content
         # Just verify we got a valid response
+
+    def test_debug_html_not_written_when_disabled(self, client, monkeypatch):
+        """Test that conversions skip debug.html unless WRITE_DEBUG_HTML is set."""
+        monkeypatch.setattr(settings, "write_debug_html", False)
+        if os.path.exists('/tmp/debug.html'):
+            os.remove('/tmp/debug.html')
+
+        convert_response = client.post(
+            "/api/convert",
+            files={"file": ("test.epub", io.BytesIO(create_test_epub()), "application/epub+zip")},
+        )
+        assert convert_response.status_code == 200
+        assert not os.path.exists('/tmp/debug.html')
+
+        response = client.get("/api/debug-html")
+        assert response.status_code == 404